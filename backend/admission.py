@@ -0,0 +1,201 @@
+"""
+Admission control for the LLM-backed endpoints.
+A global concurrency limit with a bounded FIFO queue keeps bursts under the
+OpenAI rate limits, and per-user token buckets (keyed on the bearer token)
+stop one client from using up everyone's capacity. Bearer tokens aren't
+verified, so every request also spends from a per-address bucket; minting
+new tokens doesn't buy more requests. Rejections carry a
+Retry-After estimate so callers get a fast 429 instead of a slow 500.
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, FrozenSet, Optional, Tuple
+
+# Global limit on concurrent LLM calls, and how many more may wait (and for how long)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", "10"))
+
+# Per-user budget: sustained requests per minute and burst size (0 disables)
+USER_REQUESTS_PER_MINUTE = float(os.getenv("USER_REQUESTS_PER_MINUTE", "20"))
+USER_BURST = float(os.getenv("USER_BURST", "10"))
+
+# Per-address budget, spent by every request whatever its token; looser than the
+# per-user one since a classroom can share one NAT address (0 disables)
+ADDRESS_REQUESTS_PER_MINUTE = float(os.getenv("ADDRESS_REQUESTS_PER_MINUTE", "60"))
+ADDRESS_BURST = float(os.getenv("ADDRESS_BURST", "30"))
+
+# Reverse proxies (comma-separated addresses) whose X-Forwarded-For header is believed
+TRUSTED_PROXIES = frozenset(address.strip() for address in os.getenv("TRUSTED_PROXIES", "").split(",") if address.strip())
+
+
+class AdmissionRejected(Exception):
+    """
+    Request turned away
+
+    kind is "budget", "queue_full" or "queue_timeout"; retry_after is a
+    suggested wait in seconds.
+    """
+
+    def __init__(self, kind: str, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.kind = kind
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Semaphore with a bounded FIFO wait queue and a maximum wait
+
+    A released slot is handed directly to the longest-waiting caller, so
+    late arrivals can't overtake the queue.
+    """
+
+    def __init__(self, limit: int, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._avg_hold = 1.0  # EWMA of seconds a slot is held, for Retry-After
+
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def saturated(self) -> bool:
+        """True if a new caller would be rejected without waiting"""
+        return self.active >= self.limit and len(self._waiters) >= self.max_queue
+
+    def check(self):
+        """Raise AdmissionRejected now if a new caller would be turned away"""
+        if self.saturated():
+            raise AdmissionRejected("queue_full", "LLM capacity exhausted", self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        waves = (len(self._waiters) + 1) / max(self.limit, 1)
+        return max(1, math.ceil(self._avg_hold * waves))
+
+    async def acquire(self):
+        """Take a slot, waiting in line for at most max_wait seconds"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected("queue_full", "LLM capacity exhausted", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected("queue_timeout", "Timed out waiting for LLM capacity", self.retry_after())
+            raise
+
+    def release(self):
+        """Give the slot to the next live waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block"""
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.monotonic() - start)
+            self.release()
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets: `rate` tokens per second up to `burst`
+
+    Only the most recently seen max_keys keys are tracked; an evicted key
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def check(self, key: str, cost: float = 1.0):
+        """Spend cost tokens from key's bucket, or raise AdmissionRejected"""
+        if self.rate <= 0:
+            return
+
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        allowed = tokens >= cost
+        self._buckets[key] = (tokens - cost if allowed else tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        if not allowed:
+            retry_after = max(1, math.ceil((cost - tokens) / self.rate))
+            raise AdmissionRejected("budget", "Request budget exceeded", retry_after)
+
+
+def client_address(
+    forwarded_for: Optional[str],
+    host: Optional[str],
+    trusted_proxies: FrozenSet[str] = TRUSTED_PROXIES
+) -> str:
+    """
+    Address of the client behind any trusted proxies
+
+    X-Forwarded-For is client-supplied, so it is only read when the peer is
+    a trusted proxy, and only back to the first hop that isn't one.
+    """
+    address = host or "unknown"
+    if not forwarded_for or address not in trusted_proxies:
+        return address
+    for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+        address = hop
+        if hop not in trusted_proxies:
+            break
+    return address
+
+
+def client_key(
+    authorization: Optional[str],
+    forwarded_for: Optional[str],
+    host: Optional[str],
+    trusted_proxies: FrozenSet[str] = TRUSTED_PROXIES
+) -> str:
+    """Budget key: a hash of the bearer token, else the client address"""
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+        return "token:" + hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+    return "ip:" + client_address(forwarded_for, host, trusted_proxies)
+
+
+llm_slots = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_MAX_WAIT)
+user_budgets = TokenBucketLimiter(USER_REQUESTS_PER_MINUTE / 60, USER_BURST)
+address_budgets = TokenBucketLimiter(ADDRESS_REQUESTS_PER_MINUTE / 60, ADDRESS_BURST)
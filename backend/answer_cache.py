@@ -0,0 +1,182 @@
+"""
+Semantic answer cache for the RAG chatbot.
+Stores answered questions as normalized embeddings and serves a stored
+answer when a new question is close enough, within the same scope
+(chapter + selected context).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# The indexer rewrites this file on every run; a change means stale answers
+DEFAULT_INDEX_MANIFEST = Path(__file__).parent / ".index_manifest.json"
+
+
+def cache_scope(chapter: Optional[str], context: Optional[str]) -> Tuple[str, str]:
+    """Scope key: chapter plus a hash of the selected text"""
+    context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest() if context else ""
+    return (chapter or "", context_hash)
+
+
+class _ScopeBucket:
+    """Entries of one scope with a lazily rebuilt vector matrix"""
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.vstack([entry['vector'] for entry in self.entries])
+        return self._matrix
+
+    def changed(self):
+        self._matrix = None
+
+
+class SemanticAnswerCache:
+    """
+    Nearest-neighbour cache of previous answers
+
+    Lookups compare the question embedding against earlier questions in the
+    same scope with one matrix-vector product; a hit needs cosine similarity
+    of at least `threshold` and an entry younger than `ttl_seconds`. The
+    oldest entries are evicted once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        index_manifest: Optional[Path] = None
+    ):
+        self.threshold = threshold if threshold is not None else float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+        self.index_manifest = Path(index_manifest) if index_manifest else DEFAULT_INDEX_MANIFEST
+
+        self._buckets: Dict[Tuple[str, str], _ScopeBucket] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._index_version = self._current_index_version()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _current_index_version(self) -> Optional[int]:
+        try:
+            return self.index_manifest.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_index_version(self):
+        """Drop everything if the content index was rebuilt (caller holds the lock)"""
+        version = self._current_index_version()
+        if version != self._index_version:
+            self._buckets.clear()
+            self._size = 0
+            self._index_version = version
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, vector: List[float], scope: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a question embedding
+
+        Returns:
+            Stored result dict, or None on a miss
+        """
+        if self.max_entries <= 0:
+            return None
+
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_index_version()
+            bucket = self._buckets.get(scope)
+            if bucket is None or not bucket.entries:
+                self.misses += 1
+                return None
+
+            self._expire(bucket)
+            if not bucket.entries:
+                self.misses += 1
+                return None
+
+            similarities = bucket.matrix() @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return dict(bucket.entries[best]['result'])
+
+    def store(self, vector: List[float], scope: Tuple[str, str], result: Dict[str, Any]):
+        """Remember the result for a question embedding"""
+        if self.max_entries <= 0:
+            return
+
+        entry = {
+            'vector': self._normalize(vector),
+            'result': result,
+            'created_at': time.monotonic()
+        }
+        with self._lock:
+            self._check_index_version()
+            bucket = self._buckets.setdefault(scope, _ScopeBucket())
+            bucket.entries.append(entry)
+            bucket.changed()
+            self._size += 1
+
+            while self._size > self.max_entries:
+                self._evict_oldest()
+
+    def _expire(self, bucket: _ScopeBucket):
+        """Remove entries older than the TTL (caller holds the lock)"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        fresh = [entry for entry in bucket.entries if entry['created_at'] >= cutoff]
+        if len(fresh) != len(bucket.entries):
+            self._size -= len(bucket.entries) - len(fresh)
+            bucket.entries = fresh
+            bucket.changed()
+
+    def _evict_oldest(self):
+        """Remove the globally oldest entry (caller holds the lock)"""
+        oldest_scope = min(
+            (scope for scope, bucket in self._buckets.items() if bucket.entries),
+            key=lambda scope: self._buckets[scope].entries[0]['created_at']
+        )
+        bucket = self._buckets[oldest_scope]
+        bucket.entries.pop(0)
+        bucket.changed()
+        self._size -= 1
+        if not bucket.entries:
+            del self._buckets[oldest_scope]
+
+    def invalidate(self):
+        """Forget every cached answer (call after re-indexing)"""
+        with self._lock:
+            self._buckets.clear()
+            self._size = 0
+            self._index_version = self._current_index_version()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'threshold': self.threshold
+        }
@@ -0,0 +1,624 @@
+"""
+End-to-end load and latency benchmark for the FastAPI backend.
+Runs main.app in-process against a fake OpenAI server (configurable latency
+and token rate) and in-memory Qdrant served from a child process (or the
+local vector backend with --vector-backend local), drives
+/api/chat/query, /api/personalize and /api/translate at a given concurrency
+and reports p50/p95/p99 latency, throughput and event-loop lag.
+
+    python benchmark.py --requests 200 --concurrency 20 --output bench.json
+    python benchmark.py --baseline bench.json   # compare against an earlier run
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import hashlib
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from evaluate_retrieval import DEFAULT_QUERIES, percentile
+
+BACKEND_DIR = Path(__file__).parent
+
+LEVELS = ["beginner", "intermediate", "advanced"]
+
+SAMPLE_CONTENT = (
+    "## ROS 2 Nodes\n\n"
+    "A node is a process that performs computation. Nodes communicate over "
+    "topics, services and actions. With rclpy you create a node by "
+    "subclassing rclpy.node.Node and spinning it with rclpy.spin()."
+)
+
+
+# ============================================================================
+# Fake OpenAI server
+# ============================================================================
+
+def fake_openai_app(chat_latency_ms: float, token_rate: float, answer_tokens: int, embed_latency_ms: float):
+    """
+    Minimal OpenAI-compatible API: deterministic embeddings, canned completions
+
+    Completions wait chat_latency_ms before the first token, then produce
+    answer_tokens tokens at token_rate tokens/sec (streamed or all at once).
+    """
+    import numpy as np
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    words = ["token"] * answer_tokens
+
+    def embedding(text: str, dimensions: int) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32).tolist()
+
+    def usage(body: Dict[str, Any]) -> Dict[str, int]:
+        prompt_tokens = sum(len(str(m.get('content', ''))) // 4 for m in body.get('messages', []))
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': answer_tokens,
+            'total_tokens': prompt_tokens + answer_tokens
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        dimensions = body.get('dimensions') or 3072
+        await asyncio.sleep(embed_latency_ms / 1000)
+        return {
+            'object': 'list',
+            'model': body['model'],
+            'data': [
+                {'object': 'embedding', 'index': i, 'embedding': embedding(str(text), dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            'usage': {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)}
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        base = {'id': 'chatcmpl-bench', 'created': int(time.time()), 'model': body['model']}
+        await asyncio.sleep(chat_latency_ms / 1000)
+
+        if not body.get('stream'):
+            await asyncio.sleep(answer_tokens / token_rate)
+            return {
+                **base,
+                'object': 'chat.completion',
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': " ".join(words)},
+                    'finish_reason': 'stop'
+                }],
+                'usage': usage(body)
+            }
+
+        async def chunks():
+            for word in words:
+                await asyncio.sleep(1 / token_rate)
+                yield "data: " + json.dumps({
+                    **base,
+                    'object': 'chat.completion.chunk',
+                    'choices': [{'index': 0, 'delta': {'content': word + " "}, 'finish_reason': None}]
+                }) + "\n\n"
+            if (body.get('stream_options') or {}).get('include_usage'):
+                yield "data: " + json.dumps({
+                    **base,
+                    'object': 'chat.completion.chunk',
+                    'choices': [],
+                    'usage': usage(body)
+                }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def serve_fake_openai(port: int, chat_latency_ms: float, token_rate: float, answer_tokens: int, embed_latency_ms: float):
+    """Run the fake OpenAI API (entry point of the server process)"""
+    import uvicorn
+
+    app = fake_openai_app(chat_latency_ms, token_rate, answer_tokens, embed_latency_ms)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(name: str, target, args: tuple) -> Tuple[int, multiprocessing.Process]:
+    """
+    Run target(port, *args) in a separate process and wait until it listens
+
+    Returns:
+        (port, server process)
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    process = multiprocessing.Process(target=target, args=(port, *args), daemon=True)
+    process.start()
+
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            if not process.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"{name} failed to start")
+            time.sleep(0.05)
+    return port, process
+
+
+def start_fake_openai(args: argparse.Namespace) -> Tuple[str, multiprocessing.Process]:
+    """
+    Serve the fake OpenAI API from a separate process
+
+    Keeping it out of the benchmarked process means its JSON encoding
+    doesn't compete for the GIL and show up as event-loop lag.
+
+    Returns:
+        (base URL, server process)
+    """
+    port, process = start_server(
+        "Fake OpenAI server",
+        serve_fake_openai,
+        (args.openai_latency, args.token_rate, args.answer_tokens, args.embed_latency)
+    )
+    return f"http://127.0.0.1:{port}/v1", process
+
+
+# ============================================================================
+# Qdrant server
+# ============================================================================
+
+def qdrant_app():
+    """
+    Qdrant REST API backed by qdrant-client's in-memory mode
+
+    Covers the endpoints the indexer and RAGSystem call, so both talk to the
+    same collection over HTTP exactly as they would to a Qdrant server (the
+    sync indexer, and AsyncQdrantClient search / retrieve at serving time).
+    Payload indexes are accepted but have no effect in memory.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+
+    app = FastAPI()
+    qdrant = QdrantClient(":memory:")
+
+    def ok(result: Any) -> Dict[str, Any]:
+        return {'result': jsonable_encoder(result), 'status': "ok", 'time': 0.0}
+
+    def completed() -> Dict[str, Any]:
+        return ok(models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED))
+
+    async def body(request: Request, model: Any) -> Any:
+        return TypeAdapter(model).validate_python(await request.json())
+
+    @app.exception_handler(Exception)
+    async def error(request: Request, exc: Exception):
+        status = 404 if "not found" in str(exc).lower() else 400
+        return JSONResponse({'status': {'error': str(exc)}, 'time': 0.0}, status_code=status)
+
+    @app.get("/collections")
+    async def get_collections():
+        return ok(qdrant.get_collections())
+
+    @app.get("/collections/{name}")
+    async def get_collection(name: str):
+        return ok(qdrant.get_collection(name))
+
+    @app.put("/collections/{name}")
+    async def create_collection(name: str, request: Request):
+        create = await body(request, models.CreateCollection)
+        return ok(qdrant.create_collection(
+            collection_name=name,
+            vectors_config=create.vectors,
+            sparse_vectors_config=create.sparse_vectors
+        ))
+
+    @app.patch("/collections/{name}")
+    async def update_collection(name: str, request: Request):
+        update = await body(request, models.UpdateCollection)
+        return ok(qdrant.update_collection(name, sparse_vectors_config=update.sparse_vectors))
+
+    @app.delete("/collections/{name}")
+    async def delete_collection(name: str):
+        return ok(qdrant.delete_collection(name))
+
+    @app.put("/collections/{name}/index")
+    async def create_payload_index(name: str):
+        return completed()
+
+    @app.get("/aliases")
+    async def get_aliases():
+        return ok(qdrant.get_aliases())
+
+    @app.post("/collections/aliases")
+    async def update_aliases(request: Request):
+        change = await body(request, models.ChangeAliasesOperation)
+        return ok(qdrant.update_collection_aliases(change.actions))
+
+    @app.put("/collections/{name}/points")
+    async def upsert(name: str, request: Request):
+        points = await body(request, models.PointInsertOperations)
+        if isinstance(points, models.PointsList):
+            return ok(qdrant.upsert(name, points.points))
+        return ok(qdrant.upsert(name, points.batch))
+
+    @app.post("/collections/{name}/points")
+    async def retrieve(name: str, request: Request):
+        read = await body(request, models.PointRequest)
+        return ok(qdrant.retrieve(
+            name, read.ids,
+            with_payload=read.with_payload if read.with_payload is not None else True,
+            with_vectors=read.with_vector or False
+        ))
+
+    @app.post("/collections/{name}/points/delete")
+    async def delete(name: str, request: Request):
+        return ok(qdrant.delete(name, await body(request, models.PointsSelector)))
+
+    @app.put("/collections/{name}/points/payload")
+    async def overwrite_payload(name: str, request: Request):
+        update = await body(request, models.SetPayload)
+        qdrant.overwrite_payload(name, update.payload, update.points)
+        return completed()
+
+    @app.post("/collections/{name}/points/search")
+    async def search(name: str, request: Request):
+        query = await body(request, models.SearchRequest)
+        return ok(qdrant.search(
+            name, query.vector,
+            query_filter=query.filter,
+            limit=query.limit,
+            offset=query.offset,
+            with_payload=query.with_payload if query.with_payload is not None else False,
+            with_vectors=query.with_vector or False,
+            score_threshold=query.score_threshold
+        ))
+
+    @app.post("/collections/{name}/points/scroll")
+    async def scroll(name: str, request: Request):
+        query = await body(request, models.ScrollRequest)
+        points, next_offset = qdrant.scroll(
+            name,
+            scroll_filter=query.filter,
+            limit=query.limit or 10,
+            offset=query.offset,
+            with_payload=query.with_payload if query.with_payload is not None else True,
+            with_vectors=query.with_vector or False
+        )
+        return ok({'points': points, 'next_page_offset': next_offset})
+
+    return app
+
+
+def serve_qdrant(port: int):
+    """Run the in-memory Qdrant API (entry point of the server process)"""
+    import uvicorn
+
+    uvicorn.run(qdrant_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_qdrant() -> Tuple[str, multiprocessing.Process]:
+    """
+    Serve in-memory Qdrant from a separate process
+
+    Returns:
+        (URL, server process)
+    """
+    port, process = start_server("Qdrant server", serve_qdrant, ())
+    return f"http://127.0.0.1:{port}", process
+
+
+# ============================================================================
+# Measurement
+# ============================================================================
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from short sleeps"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval) * 1000)
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        samples = self.samples or [0.0]
+        return {
+            'p50': round(percentile(samples, 50), 2),
+            'p99': round(percentile(samples, 99), 2),
+            'max': round(max(samples), 2)
+        }
+
+
+def workload(endpoint: str, count: int, distinct: int, offset: int = 0) -> List[Dict[str, Any]]:
+    """Request bodies for an endpoint; only `distinct` of them are unique"""
+    bodies = []
+    for i in range(count):
+        n = offset + i % distinct
+        if endpoint == "chat":
+            question = DEFAULT_QUERIES[n % len(DEFAULT_QUERIES)]
+            bodies.append({'query': f"{question} (variant {n})", 'chapter': "module-1/week-1"})
+        elif endpoint == "personalize":
+            bodies.append({
+                'chapter': f"module-1/week-{n % 5 + 1}",
+                'content': f"{SAMPLE_CONTENT}\n\nSection {n}.",
+                'user_level': LEVELS[n % len(LEVELS)]
+            })
+        else:
+            bodies.append({
+                'chapter': f"module-1/week-{n % 5 + 1}",
+                'content': f"{SAMPLE_CONTENT}\n\nSection {n}.",
+                'target_language': "ur"
+            })
+    return bodies
+
+
+# Warm-up bodies are numbered from here so they never pre-fill caches for measured ones
+WARMUP_OFFSET = 1_000_000
+
+ENDPOINTS = {
+    'chat': "/api/chat/query",
+    'personalize': "/api/personalize",
+    'translate': "/api/translate",
+}
+
+
+async def run_endpoint(client: Any, path: str, bodies: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """POST every body to path with at most `concurrency` requests in flight"""
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(bodies)
+
+    async def worker():
+        nonlocal errors
+        for body in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors += 1
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    lag = await monitor.stop()
+
+    return {
+        'requests': len(bodies),
+        'errors': errors,
+        'concurrency': concurrency,
+        'seconds': round(seconds, 3),
+        'throughput_rps': round(len(bodies) / seconds, 2) if seconds else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+            'mean': round(sum(latencies) / len(latencies), 2)
+        },
+        'loop_lag_ms': lag
+    }
+
+
+# ============================================================================
+# Setup
+# ============================================================================
+
+def configure_environment(
+    args: argparse.Namespace,
+    openai_base_url: str,
+    workdir: Path,
+    qdrant_url: Optional[str] = None
+):
+    """Point the app at the fake OpenAI server, Qdrant (else the local store) and throwaway state"""
+    os.environ.update({
+        'OPENAI_API_KEY': "sk-benchmark",
+        'OPENAI_BASE_URL': openai_base_url,
+        'OPENAI_API_BASE': openai_base_url,
+        'VECTOR_BACKEND': "qdrant" if qdrant_url else "local",
+        'LOCAL_VECTOR_STORE_PATH': str(workdir / "vectors"),
+        'SPARSE_INDEX_PATH': str(workdir / "sparse_index.json"),
+        'EMBEDDING_CACHE_PATH': "",
+        'DATABASE_URL': f"sqlite:///{workdir / 'benchmark.db'}",
+    })
+    if qdrant_url:
+        os.environ['QDRANT_URL'] = qdrant_url
+        os.environ.pop('QDRANT_API_KEY', None)
+    # Every benchmark request comes from one client; measure the server, not its budget
+    os.environ.setdefault('USER_REQUESTS_PER_MINUTE', "0")
+    os.environ.setdefault('ADDRESS_REQUESTS_PER_MINUTE', "0")
+    # Skip the tiktoken context-length check so the benchmark runs offline
+    os.environ.setdefault('EMBEDDING_CHECK_CTX_LENGTH', "false")
+    # Fake embeddings are random, so no chunk would clear the relevance cut-off
+    os.environ.setdefault('RAG_SCORE_THRESHOLD', "-1")
+    if args.embedding_dimensions:
+        os.environ['EMBEDDING_DIMENSIONS'] = str(args.embedding_dimensions)
+
+
+def index_corpus(workdir: Path) -> int:
+    """Index the book into the configured vector backend through the fake embeddings"""
+    from index_content import ContentIndexer
+
+    indexer = ContentIndexer(
+        openai_api_key=os.environ['OPENAI_API_KEY'],
+        qdrant_url=os.getenv("QDRANT_URL"),
+        manifest_path=workdir / "manifest.json",
+        sparse_index_path=workdir / "sparse_index.json",
+        backend=os.environ['VECTOR_BACKEND'],
+        local_store_path=workdir / "vectors"
+    )
+    indexer.ensure_collection()
+    indexer.index_sources([BACKEND_DIR.parent / "docs"])
+    return indexer.progress['chunks_total']
+
+
+def compare(results: Dict[str, Any], baseline_path: str):
+    """Print p95 latency and throughput changes against an earlier run"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\n📈 Compared with {baseline_path}:")
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous:
+            continue
+        p95_before, p95_now = previous['latency_ms']['p95'], current['latency_ms']['p95']
+        rps_before, rps_now = previous['throughput_rps'], current['throughput_rps']
+        p95_change = (p95_now - p95_before) / p95_before * 100 if p95_before else 0.0
+        rps_change = (rps_now - rps_before) / rps_before * 100 if rps_before else 0.0
+        print(f"  {name}: p95 {p95_before} → {p95_now} ms ({p95_change:+.1f}%), "
+              f"throughput {rps_before} → {rps_now} req/s ({rps_change:+.1f}%)")
+
+
+async def run(args: argparse.Namespace, endpoints: List[str]) -> Dict[str, Any]:
+    """Start the app in-process and benchmark each endpoint in turn"""
+    import httpx
+    from main import app
+
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            for name in endpoints:
+                path = ENDPOINTS[name]
+                distinct = args.distinct or args.requests
+
+                # Warm-up requests (first RAG query loads the vector store) aren't measured
+                warmup = workload(name, args.warmup, args.warmup or 1, offset=WARMUP_OFFSET)
+                await run_endpoint(client, path, warmup, min(args.concurrency, args.warmup or 1))
+
+                print(f"\n🚀 {path}: {args.requests} requests, concurrency {args.concurrency}")
+                results[name] = await run_endpoint(
+                    client, path, workload(name, args.requests, distinct), args.concurrency
+                )
+                stats = results[name]
+                print(f"  p50 {stats['latency_ms']['p50']} ms, p95 {stats['latency_ms']['p95']} ms, "
+                      f"p99 {stats['latency_ms']['p99']} ms, {stats['throughput_rps']} req/s, "
+                      f"loop lag p99 {stats['loop_lag_ms']['p99']} ms, {stats['errors']} errors")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the backend API")
+    parser.add_argument("--endpoints", default="chat,personalize,translate",
+                        help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="Distinct request bodies per endpoint (default: all distinct, i.e. no cache hits)")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint")
+    parser.add_argument("--openai-latency", type=float, default=300, help="Fake time to first token (ms)")
+    parser.add_argument("--token-rate", type=float, default=100, help="Fake generation speed (tokens/sec)")
+    parser.add_argument("--answer-tokens", type=int, default=50, help="Tokens per fake completion")
+    parser.add_argument("--embed-latency", type=float, default=50, help="Fake embedding latency (ms)")
+    parser.add_argument("--embedding-dimensions", type=int, default=0,
+                        help="EMBEDDING_DIMENSIONS for the run (default: model native size)")
+    parser.add_argument("--vector-backend", choices=["qdrant", "local"], default="qdrant",
+                        help="qdrant: in-memory Qdrant served from a child process; local: NumPy store")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    print("=" * 60)
+    print("⏱  Backend Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as tmp:
+        workdir = Path(tmp)
+        openai_base_url, server = start_fake_openai(args)
+        servers = [server]
+        try:
+            qdrant_url = None
+            if args.vector_backend == "qdrant":
+                qdrant_url, qdrant_server = start_qdrant()
+                servers.append(qdrant_server)
+            configure_environment(args, openai_base_url, workdir, qdrant_url)
+            print(f"✓ Fake OpenAI API: {openai_base_url}")
+            if qdrant_url:
+                print(f"✓ In-memory Qdrant: {qdrant_url}")
+
+            chunks = index_corpus(workdir)
+            endpoint_results = asyncio.run(run(args, endpoints))
+        finally:
+            for process in servers:
+                process.terminate()
+
+    results = {
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'distinct': args.distinct or args.requests,
+            'openai_latency_ms': args.openai_latency,
+            'token_rate': args.token_rate,
+            'answer_tokens': args.answer_tokens,
+            'embed_latency_ms': args.embed_latency,
+            'vector_backend': args.vector_backend,
+            'indexed_chunks': chunks
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'endpoints': endpoint_results
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved: {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+    failed = sum(stats['errors'] for stats in endpoint_results.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
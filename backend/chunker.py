@@ -0,0 +1,287 @@
+"""
+Structure-aware chunking for the book's Markdown and MDX.
+Splits documents at headings, drops MDX-only noise (import/export lines, JSX
+component tags, comments), keeps fenced code blocks whole and sizes chunks in
+embedding-model tokens. Every chunk carries the heading path it came from.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Chunk size and overlap between consecutive chunks of a section, in tokens
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+
+# Code blocks up to this many times CHUNK_TOKENS stay in one piece
+MAX_CODE_BLOCK_FACTOR = 3
+
+FENCE_RE = re.compile(r"^\s*(`{3,}|~{3,})")
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+MDX_IMPORT_RE = re.compile(r"^\s*import\s+.+\s+from\s+['\"].+['\"];?\s*$|^\s*import\s+['\"].+['\"];?\s*$")
+MDX_EXPORT_RE = re.compile(r"^\s*export\s+(default|const|function|let|var)\b")
+JSX_LINE_RE = re.compile(r"^\s*</?[A-Za-z][\w.]*(\s[^<>]*)?/?>\s*$")
+ADMONITION_RE = re.compile(r"^\s*:::(\w+)?\s*(.*)$")
+COMMENT_RE = re.compile(r"<!--.*?-->|\{/\*.*?\*/\}", re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def token_counter(model: str = "text-embedding-3-large") -> Callable[[str], int]:
+    """
+    Token counting function for a model
+
+    Falls back to ~4 characters per token when tiktoken or its encoding
+    files aren't available (e.g. offline).
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        print(f"Warning: tiktoken unavailable ({e}); estimating tokens from length")
+        # Rounded up, so per-sentence counts summed never undercount a chunk
+        return lambda text: max(1, -(-len(text) // 4))
+
+
+def strip_mdx(text: str) -> str:
+    """
+    Remove MDX/JSX noise outside fenced code blocks
+
+    Drops import/export statements, lines that are only JSX tags and
+    HTML/MDX comments; admonition fences (:::tip Title) keep their title.
+    """
+    text = COMMENT_RE.sub("", text)
+    lines = []
+    fence: Optional[str] = None
+    in_export = False
+
+    for line in text.split("\n"):
+        marker = FENCE_RE.match(line)
+        if fence is not None:
+            lines.append(line)
+            if marker and marker.group(1)[0] == fence[0] and len(marker.group(1)) >= len(fence):
+                fence = None
+            continue
+        if marker:
+            fence = marker.group(1)
+            lines.append(line)
+            continue
+
+        # An export block runs to the next blank line
+        if in_export:
+            in_export = bool(line.strip())
+            continue
+        if MDX_EXPORT_RE.match(line):
+            in_export = True
+            continue
+        if MDX_IMPORT_RE.match(line) or JSX_LINE_RE.match(line):
+            continue
+
+        admonition = ADMONITION_RE.match(line)
+        if admonition:
+            title = admonition.group(2).strip()
+            if title:
+                lines.append(f"**{title}**")
+            continue
+
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def parse_sections(text: str) -> List[Tuple[List[str], List[str]]]:
+    """
+    Split Markdown into (heading_path, blocks) sections
+
+    Blocks are paragraphs, lists or whole fenced code blocks. A section's
+    first block is its heading line (the preamble before any heading has none).
+    """
+    sections: List[Tuple[List[str], List[str]]] = []
+    path: List[Tuple[int, str]] = []
+    blocks: List[str] = []
+    current: List[str] = []
+    fence: Optional[str] = None
+
+    def end_block():
+        if current and any(line.strip() for line in current):
+            blocks.append("\n".join(current).strip("\n"))
+        current.clear()
+
+    def end_section():
+        end_block()
+        if any(not HEADING_RE.match(block) for block in blocks):
+            sections.append(([title for _, title in path], list(blocks)))
+        blocks.clear()
+
+    for line in text.split("\n"):
+        marker = FENCE_RE.match(line)
+        if fence is not None:
+            current.append(line)
+            if marker and marker.group(1)[0] == fence[0] and len(marker.group(1)) >= len(fence):
+                fence = None
+                end_block()
+            continue
+        if marker:
+            end_block()
+            fence = marker.group(1)
+            current.append(line)
+            continue
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            end_section()
+            level = len(heading.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, heading.group(2).strip()))
+            blocks.append(line.strip())
+            continue
+
+        if line.strip():
+            current.append(line)
+        else:
+            end_block()
+
+    end_section()
+    return sections
+
+
+class MarkdownChunker:
+    """
+    Packs heading sections into token-bounded chunks
+
+    Consecutive small sections share a chunk; a section too large for one
+    chunk is split between blocks, and its continuation chunks repeat the
+    section heading and overlap the previous chunk by up to overlap_tokens.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens or token_counter(os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"))
+
+    def chunk(self, text: str) -> List[Dict]:
+        """Chunks of a document as {'text', 'heading_path', 'tokens'}"""
+        chunks: List[Dict] = []
+        pending: List[str] = []
+        pending_paths: List[List[str]] = []
+        pending_tokens = 0
+
+        def flush():
+            nonlocal pending_tokens
+            if pending:
+                chunks.append(self._chunk(pending, _common_prefix(pending_paths), pending_tokens))
+            pending.clear()
+            pending_paths.clear()
+            pending_tokens = 0
+
+        for path, blocks in parse_sections(strip_mdx(text)):
+            body = "\n\n".join(blocks)
+            tokens = self.count_tokens(body)
+            if pending and pending_tokens + tokens > self.max_tokens:
+                flush()
+            if tokens <= self.max_tokens:
+                pending.append(body)
+                pending_paths.append(path)
+                pending_tokens += tokens
+                continue
+            chunks.extend(self._split_section(path, blocks))
+
+        flush()
+        return chunks
+
+    def _split_section(self, path: List[str], blocks: List[str]) -> List[Dict]:
+        """Chunks of one section larger than max_tokens"""
+        heading = blocks[0] if HEADING_RE.match(blocks[0]) else None
+        pieces: List[Tuple[str, int]] = []
+        for block in blocks:
+            pieces.extend(self._pieces(block))
+
+        def size_of(parts: List[Tuple[str, int]]) -> int:
+            return sum(t for _, t in parts)
+
+        chunks: List[Dict] = []
+        current: List[Tuple[str, int]] = []
+        size = 0
+        for piece, tokens in pieces:
+            # A heading is never a chunk on its own; it goes with the next piece
+            # even when that piece is an oversized code block
+            heading_only = len(current) == 1 and current[0][0] == heading
+            if current and not heading_only and size + tokens > self.max_tokens:
+                chunks.append(self._chunk([p for p, _ in current], path, size))
+                current = self._overlap(current)
+                if size_of(current) + tokens > self.max_tokens:
+                    current = []
+                if heading and (not current or current[0][0] != heading):
+                    current.insert(0, (heading, self.count_tokens(heading)))
+                size = size_of(current)
+            current.append((piece, tokens))
+            size += tokens
+        if current:
+            chunks.append(self._chunk([p for p, _ in current], path, size))
+        return chunks
+
+    def _pieces(self, block: str) -> List[Tuple[str, int]]:
+        """A block as (text, tokens) pieces no larger than a chunk (code may be larger)"""
+        tokens = self.count_tokens(block)
+        limit = self.max_tokens * (MAX_CODE_BLOCK_FACTOR if FENCE_RE.match(block) else 1)
+        if tokens <= limit:
+            return [(block, tokens)]
+
+        # Oversized: split on lines (code) or sentences (prose)
+        if FENCE_RE.match(block):
+            units = [line + "\n" for line in block.split("\n")]
+        else:
+            units = [unit + " " for unit in re.split(r"(?<=[.!?])\s+|\n", block) if unit]
+        # Units are counted once and summed; recounting the growing piece is quadratic
+        pieces: List[Tuple[str, int]] = []
+        current: List[str] = []
+        size = 0
+        for unit in units:
+            unit_tokens = self.count_tokens(unit)
+            if current and size + unit_tokens > limit:
+                pieces.append(self._piece(current))
+                current, size = [], 0
+            current.append(unit)
+            size += unit_tokens
+        if "".join(current).strip():
+            pieces.append(self._piece(current))
+        return pieces
+
+    def _piece(self, units: List[str]) -> Tuple[str, int]:
+        text = "".join(units).strip()
+        return text, self.count_tokens(text)
+
+    def _overlap(self, pieces: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Trailing prose pieces worth at most overlap_tokens"""
+        kept: List[Tuple[str, int]] = []
+        size = 0
+        for piece, tokens in reversed(pieces):
+            if FENCE_RE.match(piece) or HEADING_RE.match(piece) or size + tokens > self.overlap_tokens:
+                break
+            kept.insert(0, (piece, tokens))
+            size += tokens
+        return kept
+
+    @staticmethod
+    def _chunk(parts: List[str], path: List[str], tokens: int) -> Dict:
+        return {'text': "\n\n".join(parts), 'heading_path': path, 'tokens': tokens}
+
+
+def _common_prefix(paths: List[List[str]]) -> List[str]:
+    """Longest heading path shared by every section in a chunk"""
+    prefix = list(paths[0]) if paths else []
+    for path in paths[1:]:
+        while path[:len(prefix)] != prefix:
+            prefix.pop()
+    return prefix
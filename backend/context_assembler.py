@@ -0,0 +1,116 @@
+"""
+Context assembly between retrieval and generation.
+Retrieval over-fetches candidates; this module drops the ones below a cosine
+similarity cut-off, orders the rest by maximal marginal relevance (so
+overlapping neighbour chunks don't crowd out other sections) and packs them
+into a fixed prompt token budget. When nothing clears the cut-off the caller
+answers with NO_CONTEXT_ANSWER instead of calling the LLM.
+"""
+
+import os
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunker import token_counter
+
+# Candidates fetched for assembly (per retriever when hybrid search is on)
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "20"))
+
+# Cosine similarity a chunk needs to reach the prompt; chapter-scoped
+# retrieval also widens its scope when fewer than k hits reach it
+RAG_SCORE_THRESHOLD = float(os.getenv("RAG_SCORE_THRESHOLD", "0.3"))
+
+# MMR trade-off: 1.0 ranks by relevance only, lower values favour diversity
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+# Prompt tokens available for retrieved chunks
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+NO_CONTEXT_ANSWER = os.getenv(
+    "NO_CONTEXT_ANSWER",
+    "I couldn't find anything about that in the textbook. "
+    "Try rephrasing your question, or ask about a topic the book covers."
+)
+
+
+def mmr(relevance: np.ndarray, similarity: np.ndarray, lambda_mult: float, k: int) -> List[int]:
+    """
+    Indices picked by maximal marginal relevance, in pick order
+
+    Args:
+        relevance: Similarity of each candidate to the query
+        similarity: Pairwise similarity between candidates
+    """
+    selected: List[int] = []
+    remaining = list(range(len(relevance)))
+    redundancy = np.zeros(len(relevance), dtype=np.float32)
+    while remaining and len(selected) < k:
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy[remaining]
+        best = remaining.pop(int(np.argmax(scores)))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+class ContextAssembler:
+    """Threshold, MMR and token-budget packing of retrieved chunks"""
+
+    def __init__(
+        self,
+        min_score: float = RAG_SCORE_THRESHOLD,
+        mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.min_score = min_score
+        self.mmr_lambda = mmr_lambda
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens or token_counter(os.getenv("CHAT_MODEL", "gpt-3.5-turbo"))
+
+    def assemble(
+        self,
+        query_vector: Sequence[float],
+        candidates: List[Tuple[Any, Optional[Sequence[float]]]],
+        k: int
+    ) -> List[Any]:
+        """
+        Up to k documents for the prompt, most relevant first
+
+        Args:
+            candidates: (document, vector) pairs; documents without a vector
+                can't be scored and are dropped
+        """
+        scored = [(doc, vector) for doc, vector in candidates if vector is not None]
+        if not scored:
+            return []
+
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        matrix = _normalize(np.asarray([vector for _, vector in scored], dtype=np.float32))
+        relevance = matrix @ query
+
+        keep = np.flatnonzero(relevance >= self.min_score)
+        if keep.size == 0:
+            return []
+        matrix, relevance = matrix[keep], relevance[keep]
+
+        docs = []
+        budget = self.token_budget
+        for i in mmr(relevance, matrix @ matrix.T, self.mmr_lambda, len(keep)):
+            doc = scored[int(keep[i])][0]
+            tokens = self.count_tokens(doc.page_content)
+            # The top chunk always goes in; later ones that don't fit are skipped
+            # in favour of smaller, less relevant ones that might
+            if tokens > budget and docs:
+                continue
+            docs.append(doc)
+            budget -= tokens
+            if len(docs) >= k or budget <= 0:
+                break
+        return docs
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector or the rows of a matrix"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
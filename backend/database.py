@@ -1,20 +1,111 @@
 """
 Database models and operations
 Uses SQLAlchemy with Neon Serverless Postgres
+The cache helpers run on a sync engine (called through the threadpool);
+request-path writes such as chat logging use the async engine.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, JSON, Text
+from sqlalchemy import create_engine, func, inspect, make_url, select, tuple_, Column, Integer, String, DateTime, JSON, Text, Index
+from sqlalchemy.engine import URL
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.orm import sessionmaker, Session
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
 import os
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
-engine = create_engine(DATABASE_URL)
+
+# Connection pool, sized for Neon's connection limits. Neon closes idle
+# connections when a compute scales to zero, so connections are pinged before
+# use and recycled before its idle timeout.
+# DB_POOL_SIZE + DB_MAX_OVERFLOW is the total across both engines: the sync
+# engine (cache helpers, startup, cleanup) gets a fixed DB_SYNC_POOL_SIZE
+# connections out of DB_POOL_SIZE, the async engine the rest plus the overflow.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_SYNC_POOL_SIZE = max(1, min(int(os.getenv("DB_SYNC_POOL_SIZE", "2")), DB_POOL_SIZE - 1))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "240"))
+
+
+def pool_settings(url: str, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """Pool arguments for create_engine (SQLite keeps SQLAlchemy's defaults)"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def async_database_url(url: str) -> Tuple[URL, Dict[str, Any]]:
+    """
+    DATABASE_URL rewritten for an async driver, plus its connect_args
+    
+    asyncpg takes `ssl` instead of libpq's `sslmode` (and doesn't know
+    `channel_binding`), and can't use prepared statements through Neon's
+    PgBouncer (`-pooler`) endpoints.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite"), {}
+    if backend in ("postgresql", "postgres"):
+        query = dict(parsed.query)
+        connect_args: Dict[str, Any] = {}
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        if "-pooler" in (parsed.host or ""):
+            connect_args["statement_cache_size"] = 0
+            query["prepared_statement_cache_size"] = "0"
+        return parsed.set(drivername="postgresql+asyncpg", query=query), connect_args
+    return parsed, {}
+
+
+engine = create_engine(DATABASE_URL, **pool_settings(DATABASE_URL, DB_SYNC_POOL_SIZE, 0))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine on the same database (created on first use)"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        url, connect_args = async_database_url(DATABASE_URL)
+        _async_engine = create_async_engine(
+            url,
+            connect_args=connect_args,
+            **pool_settings(DATABASE_URL, max(1, DB_POOL_SIZE - DB_SYNC_POOL_SIZE), DB_MAX_OVERFLOW)
+        )
+        _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """New session on the async engine"""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def dispose_async_engine():
+    """Close the async engine's pooled connections (application shutdown)"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_sessionmaker = None
+
 
 class User(Base):
     """User model with profile information"""
@@ -47,9 +138,13 @@ class Conversation(Base):
 class Message(Base):
     """Individual chat messages"""
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a conversation's history (also serves conversation_id lookups)
+        Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(String, index=True)
+    conversation_id = Column(String)
     role = Column(String)  # user or assistant
     content = Column(Text)
     context = Column(Text, nullable=True)  # Selected text context
@@ -58,33 +153,250 @@ class Message(Base):
 
 
 class PersonalizationCache(Base):
-    """Cache personalized content"""
+    """Cache personalized content (shared per level, not per user)"""
     __tablename__ = "personalization_cache"
+    __table_args__ = (
+        # One row per lookup key; also serves the cache lookup
+        Index(
+            "ix_personalization_cache_lookup",
+            "chapter", "user_level", "original_content_hash",
+            unique=True
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
-    chapter = Column(String)
-    user_level = Column(String)
-    original_content_hash = Column(String)
+    chapter = Column(String, nullable=False, default="")
+    user_level = Column(String, nullable=False)
+    original_content_hash = Column(String, nullable=False)
     personalized_content = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class TranslationCache(Base):
     """Cache translated content"""
     __tablename__ = "translation_cache"
+    __table_args__ = (
+        # One row per lookup key; also serves the cache lookup
+        Index(
+            "ix_translation_cache_lookup",
+            "chapter", "target_language", "original_content_hash",
+            unique=True
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    chapter = Column(String)
-    target_language = Column(String)
-    original_content_hash = Column(String)
+    chapter = Column(String, nullable=False, default="")  # "" when unknown (NULLs never collide)
+    target_language = Column(String, nullable=False)
+    original_content_hash = Column(String, nullable=False)
     translated_content = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+# Cache eviction limits
+TRANSLATION_CACHE_MAX_AGE_DAYS = int(os.getenv("TRANSLATION_CACHE_MAX_AGE_DAYS", "30"))
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "5000"))
+PERSONALIZATION_CACHE_MAX_AGE_DAYS = int(os.getenv("PERSONALIZATION_CACHE_MAX_AGE_DAYS", "30"))
+PERSONALIZATION_CACHE_MAX_ENTRIES = int(os.getenv("PERSONALIZATION_CACHE_MAX_ENTRIES", "5000"))
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 of content, used as the cache key for generated rewrites"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def get_cached_translation(
+    db: Session,
+    chapter: Optional[str],
+    target_language: str,
+    original_content_hash: str
+) -> Optional[TranslationCache]:
+    """Look up a fresh cached translation"""
+    cutoff = datetime.utcnow() - timedelta(days=TRANSLATION_CACHE_MAX_AGE_DAYS)
+    return (
+        db.query(TranslationCache)
+        .filter(
+            TranslationCache.chapter == (chapter or ""),
+            TranslationCache.target_language == target_language,
+            TranslationCache.original_content_hash == original_content_hash,
+            TranslationCache.created_at >= cutoff
+        )
+        .first()
+    )
+
+
+def store_translation(
+    db: Session,
+    chapter: Optional[str],
+    target_language: str,
+    original_content_hash: str,
+    translated_content: str
+):
+    """Insert or refresh a cached translation, then evict old entries"""
+    key = (
+        TranslationCache.chapter == (chapter or ""),
+        TranslationCache.target_language == target_language,
+        TranslationCache.original_content_hash == original_content_hash
+    )
+    entry = db.query(TranslationCache).filter(*key).first()
+    if entry is None:
+        entry = TranslationCache(
+            chapter=chapter or "",
+            target_language=target_language,
+            original_content_hash=original_content_hash
+        )
+        db.add(entry)
+    entry.translated_content = translated_content
+    entry.created_at = datetime.utcnow()
+    
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same key first; keep theirs
+        db.rollback()
+    
+    evict_translation_cache(db)
+
+
+def evict_translation_cache(db: Session):
+    """Delete translations older than the max age and trim to the size cap"""
+    _evict_cache(db, TranslationCache, TRANSLATION_CACHE_MAX_AGE_DAYS, TRANSLATION_CACHE_MAX_ENTRIES)
+
+
+def get_cached_personalization(
+    db: Session,
+    chapter: Optional[str],
+    user_level: str,
+    original_content_hash: str
+) -> Optional[PersonalizationCache]:
+    """Look up a fresh cached rewrite for a level"""
+    cutoff = datetime.utcnow() - timedelta(days=PERSONALIZATION_CACHE_MAX_AGE_DAYS)
+    return (
+        db.query(PersonalizationCache)
+        .filter(
+            PersonalizationCache.chapter == (chapter or ""),
+            PersonalizationCache.user_level == user_level,
+            PersonalizationCache.original_content_hash == original_content_hash,
+            PersonalizationCache.created_at >= cutoff
+        )
+        .first()
+    )
+
+
+def store_personalization(
+    db: Session,
+    chapter: Optional[str],
+    user_level: str,
+    original_content_hash: str,
+    personalized_content: str
+):
+    """Insert or refresh a cached rewrite, then evict old entries"""
+    key = (
+        PersonalizationCache.chapter == (chapter or ""),
+        PersonalizationCache.user_level == user_level,
+        PersonalizationCache.original_content_hash == original_content_hash
+    )
+    entry = db.query(PersonalizationCache).filter(*key).first()
+    if entry is None:
+        entry = PersonalizationCache(
+            chapter=chapter or "",
+            user_level=user_level,
+            original_content_hash=original_content_hash
+        )
+        db.add(entry)
+    entry.personalized_content = personalized_content
+    entry.created_at = datetime.utcnow()
+    
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same key first; keep theirs
+        db.rollback()
+    
+    _evict_cache(db, PersonalizationCache, PERSONALIZATION_CACHE_MAX_AGE_DAYS, PERSONALIZATION_CACHE_MAX_ENTRIES)
+
+
+def _evict_cache(db: Session, model, max_age_days: int, max_entries: int):
+    """Delete cache rows older than max_age_days and trim to max_entries"""
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    db.query(model).filter(model.created_at < cutoff).delete(synchronize_session=False)
+    
+    # created_at of the newest entry beyond the cap; everything up to it goes
+    overflow = (
+        db.query(model.created_at)
+        .order_by(model.created_at.desc())
+        .offset(max_entries)
+        .limit(1)
+        .scalar()
+    )
+    if overflow is not None:
+        db.query(model).filter(model.created_at <= overflow).delete(synchronize_session=False)
+    
+    db.commit()
+
+
+# Largest page /api/chat/history will return
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "200"))
+
+
+async def get_message_page(
+    session: AsyncSession,
+    conversation_id: str,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    after: Optional[Tuple[datetime, int]] = None
+) -> List[Message]:
+    """
+    One page of a conversation's messages, oldest first
+    
+    Pages are keyset-based on (created_at, id), so each one is a range scan
+    of ix_messages_conversation_created no matter how deep it is. With
+    `after`, returns the first `limit` messages newer than that position;
+    otherwise the last `limit` messages before `before` (or the end).
+    """
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    position = tuple_(Message.created_at, Message.id)
+    
+    if after is not None:
+        query = query.where(position > tuple_(*after)).order_by(Message.created_at, Message.id)
+        result = await session.execute(query.limit(limit))
+        return list(result.scalars())
+    
+    if before is not None:
+        query = query.where(position < tuple_(*before))
+    query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+    result = await session.execute(query)
+    return list(reversed(result.scalars().all()))
 
 
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist; add indexes introduced since
+    for model in (Message, TranslationCache, PersonalizationCache):
+        _create_missing_indexes(model)
+
+
+def _create_missing_indexes(model):
+    """Create a model's indexes that its (older) table doesn't have yet"""
+    table = model.__table__
+    existing = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        if index.unique:
+            _drop_duplicate_keys(table, [column.name for column in index.columns])
+        index.create(bind=engine)
+        print(f"✓ Created index {index.name}")
+
+
+def _drop_duplicate_keys(table, columns: List[str]):
+    """Keep the newest row per key so a unique index can be built on an old cache table"""
+    with engine.begin() as conn:
+        if 'chapter' in columns:
+            # Rows written before chapter was part of the key; lookups use "" for unknown
+            conn.execute(table.update().where(table.c.chapter.is_(None)).values(chapter=""))
+        newest = select(func.max(table.c.id)).group_by(*[table.c[name] for name in columns])
+        conn.execute(table.delete().where(table.c.id.not_in(newest)))
 
 
 def get_db():
@@ -0,0 +1,245 @@
+"""
+Two-tier embedding cache shared by RAGSystem and ContentIndexer.
+A bounded in-process LRU sits in front of a persistent SQLite store, both
+keyed by (model, dimensions, text hash), so repeated questions and unchanged
+chunks never hit the embeddings API twice.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".embedding_cache.sqlite3"
+DEFAULT_MEMORY_SIZE = 2048
+# ~12KB per row at 3072 dimensions; well above the book's chunk count
+DEFAULT_DISK_SIZE = 20000
+
+
+def _encode(vector: List[float]) -> bytes:
+    return array('f', vector).tobytes()
+
+
+def _decode(blob: bytes) -> List[float]:
+    vector = array('f')
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an LRU + SQLite cache
+
+    Drop-in replacement for the wrapped embeddings object: only texts missing
+    from both tiers are sent to the underlying model, in a single batch. The
+    async methods run SQLite reads and writes in a worker thread.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_path: Optional[str] = None,
+        memory_size: Optional[int] = None,
+        disk_size: Optional[int] = None
+    ):
+        """
+        Args:
+            embeddings: Underlying embeddings (e.g. OpenAIEmbeddings)
+            cache_path: SQLite file, or "" to keep the cache in memory only
+            memory_size: Maximum vectors held in the in-process LRU
+            disk_size: Maximum rows kept in SQLite; the oldest writes go first
+        """
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, 'model', type(embeddings).__name__)
+        self.dimensions = getattr(embeddings, 'dimensions', None)
+
+        if cache_path is None:
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH", str(DEFAULT_CACHE_PATH))
+        if memory_size is None:
+            memory_size = int(os.getenv("EMBEDDING_CACHE_SIZE", str(DEFAULT_MEMORY_SIZE)))
+        if disk_size is None:
+            disk_size = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", str(DEFAULT_DISK_SIZE)))
+
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._disk_rows = 0
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_path:
+            try:
+                self._db = sqlite3.connect(cache_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self._db.commit()
+                self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except sqlite3.Error as e:
+                print(f"Warning: persistent embedding cache disabled ({cache_path}): {e}")
+                self._db = None
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{self.model}:{self.dimensions}:{digest}"
+
+    def _lookup_memory(self, keys: List[str]) -> Tuple[Dict[str, List[float]], List[str]]:
+        """Cached vectors from the LRU, and the keys it doesn't have"""
+        found: Dict[str, List[float]] = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+        return found, missing
+
+    def _lookup_disk(self, missing: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors from SQLite for keys the LRU missed"""
+        found: Dict[str, List[float]] = {}
+        if self._db is not None:
+            placeholders = ",".join("?" * len(missing))
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+            found = {key: _decode(blob) for key, blob in rows}
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+            self.disk_hits += len(found)
+            self.misses += len(set(missing) - found.keys())
+        return found
+
+    def _remember(self, key: str, vector: List[float]):
+        """Insert into the LRU (caller holds the lock)"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _store(self, entries: Dict[str, List[float]]):
+        """Write freshly computed vectors to both tiers"""
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+        self._persist(entries)
+
+    async def _astore(self, entries: Dict[str, List[float]]):
+        """Async variant of _store()"""
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+        if self._db is not None:
+            await asyncio.to_thread(self._persist, entries)
+
+    def _persist(self, entries: Dict[str, List[float]]):
+        """Write vectors to SQLite, then trim it to disk_size rows"""
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, _encode(vector)) for key, vector in entries.items()]
+            )
+            # Replaced rows are counted again, so this overestimates; a trim resets it
+            self._disk_rows += len(entries)
+            if self._disk_rows > self.disk_size:
+                # INSERT OR REPLACE gives every write a new rowid, so the lowest are the oldest
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE rowid <= "
+                    "(SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                    (self.disk_size,)
+                )
+                self._disk_rows = min(self._disk_rows, self.disk_size)
+            self._db.commit()
+
+    def _split(self, texts: List[str]):
+        """Return keys, cached vectors and the unique texts still to embed"""
+        keys = [self._key(text) for text in texts]
+        found, missing = self._lookup_memory(keys)
+        if missing:
+            found.update(self._lookup_disk(missing))
+        return keys, found, self._pending(keys, texts, found)
+
+    async def _asplit(self, texts: List[str]):
+        """Async variant of _split()"""
+        keys = [self._key(text) for text in texts]
+        found, missing = self._lookup_memory(keys)
+        if missing and self._db is not None:
+            found.update(await asyncio.to_thread(self._lookup_disk, missing))
+        elif missing:
+            found.update(self._lookup_disk(missing))
+        return keys, found, self._pending(keys, texts, found)
+
+    @staticmethod
+    def _pending(keys: List[str], texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        """Unique texts whose keys aren't cached"""
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        return pending
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, pending = self._split(texts)
+        if pending:
+            vectors = self.embeddings.embed_documents(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, pending = self._split([text])
+        if pending:
+            vector = self.embeddings.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, pending = await self._asplit(texts)
+        if pending:
+            vectors = await self.embeddings.aembed_documents(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            await self._astore(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, pending = await self._asplit([text])
+        if pending:
+            vector = await self.embeddings.aembed_query(text)
+            await self._astore({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for both cache tiers"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'persistent': self._db is not None
+        }
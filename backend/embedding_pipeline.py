@@ -0,0 +1,235 @@
+"""
+Concurrent, batched embedding pipeline for the content indexer.
+Embeds chunks in batches on a bounded thread pool, backs off on rate limits
+and overlaps Qdrant upserts with the next embedding batches.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if an exception is an HTTP 429 / rate-limit response"""
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    if type(error).__name__ == 'RateLimitError':
+        return True
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True if an exception is worth retrying (rate limit, 5xx, connection)"""
+    if is_rate_limit_error(error):
+        return True
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None and status_code >= 500:
+        return True
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError', 'InternalServerError')
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-suggested wait from a Retry-After header, if present"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that halves on rate limits and grows back by one
+    after a run of successful calls (AIMD).
+    """
+
+    def __init__(self, max_limit: int, recover_after: int = 5):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.recover_after = recover_after
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, rate_limited: bool = False):
+        with self._condition:
+            self._active -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.recover_after and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class EmbeddingPipeline:
+    """
+    Embed-then-upsert pipeline with backpressure
+
+    Batches are embedded on up to `concurrency` worker threads while a single
+    upsert thread writes finished batches in order. At most `concurrency`
+    embedding batches and `max_pending_upserts` upserts are in flight, so
+    memory stays bounded no matter how many chunks are fed in.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        upsert_fn: Callable[[List[Dict], List[List[float]]], None],
+        batch_size: int = 64,
+        concurrency: int = 4,
+        max_pending_upserts: int = 2,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        """
+        Args:
+            embeddings: Object with embed_documents(texts) -> vectors
+            upsert_fn: Called with (chunks, vectors) for each embedded batch
+            batch_size: Chunks per embedding request
+            concurrency: Maximum concurrent embedding requests
+            max_pending_upserts: Embedded batches allowed to wait for upsert
+            max_retries: Retries per batch on transient errors
+            base_delay: Initial backoff in seconds
+            max_delay: Backoff ceiling in seconds
+        """
+        self.embeddings = embeddings
+        self.upsert_fn = upsert_fn
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_pending_upserts = max(1, max_pending_upserts)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.limiter = AdaptiveLimiter(self.concurrency)
+        self._stats_lock = threading.Lock()
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _batches(self, chunks: Iterable[Dict]) -> Iterable[List[Dict]]:
+        """Group chunks into lists of batch_size"""
+        batch: List[Dict] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, backing off with full jitter on transient errors"""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self.limiter.release(rate_limited=rate_limited)
+
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+
+                with self._stats_lock:
+                    self.retries += 1
+                    if rate_limited:
+                        self.rate_limited += 1
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                suggested = retry_after_seconds(e)
+                if suggested is not None:
+                    delay = max(delay, suggested)
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            self.limiter.release()
+            return vectors
+
+    def run(
+        self,
+        chunks: Iterable[Dict],
+        on_batch_done: Optional[Callable[[List[Dict]], None]] = None,
+        on_batch_embedded: Optional[Callable[[List[Dict]], None]] = None
+    ) -> Dict[str, float]:
+        """
+        Embed and upsert every chunk
+
+        Args:
+            chunks: Dicts with at least a 'text' key
+            on_batch_done: Called on the upsert thread after each batch is stored
+            on_batch_embedded: Called on the calling thread as each batch's
+                embeddings arrive (before it is queued for upsert)
+
+        Returns:
+            Dict with chunks, seconds, chunks_per_sec, retries, rate_limited
+        """
+        started = time.perf_counter()
+        total = 0
+
+        embed_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+        upsert_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upsert")
+        embedding: Deque[Tuple[List[Dict], Future]] = deque()
+        upserting: Deque[Future] = deque()
+
+        def store(batch: List[Dict], vectors: List[List[float]]):
+            self.upsert_fn(batch, vectors)
+            if on_batch_done:
+                on_batch_done(batch)
+
+        def hand_off_oldest():
+            # Wait for the oldest embedding, then queue its upsert behind the others
+            batch, future = embedding.popleft()
+            vectors = future.result()
+            if on_batch_embedded:
+                on_batch_embedded(batch)
+            while len(upserting) >= self.max_pending_upserts:
+                upserting.popleft().result()
+            upserting.append(upsert_pool.submit(store, batch, vectors))
+
+        try:
+            for batch in self._batches(chunks):
+                while len(embedding) >= self.concurrency:
+                    hand_off_oldest()
+                embedding.append((batch, embed_pool.submit(self._embed_with_retry, [c['text'] for c in batch])))
+                total += len(batch)
+
+            while embedding:
+                hand_off_oldest()
+            while upserting:
+                upserting.popleft().result()
+
+        finally:
+            for _, future in embedding:
+                future.cancel()
+            embed_pool.shutdown(wait=True, cancel_futures=True)
+            upsert_pool.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'chunks': total,
+            'seconds': round(elapsed, 2),
+            'chunks_per_sec': round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'final_concurrency': self.limiter.limit
+        }
@@ -0,0 +1,199 @@
+"""
+Measure retrieval quality and latency of the configured vector storage.
+Compares the production search (quantized + rescored, if enabled) against
+exact full-precision search over the same collection, and, when
+EMBEDDING_DIMENSIONS is reduced, top-k over a sample of chunks re-embedded at
+the model's native size, so either change can be checked against a recall
+tolerance before rollout.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, List, Sequence
+
+import numpy as np
+from pydantic import SecretStr
+
+DEFAULT_QUERIES = [
+    "What are the hardware requirements?",
+    "Explain ROS 2 basics",
+    "How does SLAM work?",
+    "What is Physical AI?",
+    "How do I create a ROS 2 node with rclpy?",
+    "What is a URDF file?",
+    "How do I simulate a robot in Gazebo?",
+    "What can I do with NVIDIA Isaac Sim?",
+    "Which Jetson Orin board do I need?",
+    "What are Vision-Language-Action models?",
+    "How do sensors like LiDAR and IMU work together?",
+    "How do I set up Ubuntu for ROS 2 development?",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def top_k(documents: Sequence[Sequence[float]], queries: Sequence[Sequence[float]], k: int) -> List[set]:
+    """Row indices of the k most cosine-similar documents for each query"""
+    matrix = np.asarray(documents, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    scores = matrix @ np.asarray(queries, dtype=np.float32).T
+    k = min(k, matrix.shape[0])
+    return [set(np.argpartition(-column, k - 1)[:k].tolist()) for column in scores.T]
+
+
+def dimension_recall(
+    client: Any,
+    collection_name: str,
+    native_embeddings: Any,
+    queries: List[str],
+    query_vectors: List[List[float]],
+    k: int,
+    sample: int
+) -> List[float]:
+    """
+    Recall@k of the stored reduced-size vectors against native-size embeddings
+
+    A sample of chunks and the queries are re-embedded without `dimensions`;
+    both rankings are computed over the same sample.
+    """
+    points, _ = client.scroll(collection_name, limit=sample, with_payload=True, with_vectors=True)
+    texts = [(point.payload or {}).get('page_content', '') for point in points]
+    if not texts:
+        return []
+    reduced = top_k([point.vector for point in points], query_vectors, k)
+    native = top_k(native_embeddings.embed_documents(texts), native_embeddings.embed_documents(queries), k)
+    return [len(r & n) / len(n) for r, n in zip(reduced, native)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate vector search recall and latency")
+    parser.add_argument("--k", type=int, default=4, help="Results per query")
+    parser.add_argument("--queries", help="File with one query per line (default: built-in set)")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Fail below this recall@k")
+    parser.add_argument("--sample", type=int, default=1000,
+                        help="Chunks re-embedded at native size for the dimension check")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from langchain_openai import OpenAIEmbeddings
+    from qdrant_client import QdrantClient, models
+    from embedding_cache import CachedEmbeddings
+    from vector_config import (
+        embeddings_kwargs,
+        search_params,
+        vector_size,
+        bytes_per_vector,
+        EMBEDDING_MODEL,
+        NATIVE_DIMENSIONS,
+        VECTOR_QUANTIZATION,
+        QUANTIZATION_OVERSAMPLING,
+    )
+
+    print("=" * 60)
+    print("🎯 Retrieval Evaluation")
+    print("=" * 60)
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(
+        **embeddings_kwargs(),
+        api_key=SecretStr(os.getenv("OPENAI_API_KEY", ""))
+    ))
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+    collection_name = "physical_ai_robotics_book"
+
+    exact_params = models.SearchParams(
+        exact=True,
+        quantization=models.QuantizationSearchParams(ignore=True)
+    )
+    production_params = search_params()
+
+    vectors = embeddings.embed_documents(queries)
+    recalls = []
+    exact_ms = []
+    production_ms = []
+
+    for query, vector in zip(queries, vectors):
+        start = time.perf_counter()
+        exact = client.search(collection_name, query_vector=vector, limit=args.k, search_params=exact_params)
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        found = client.search(collection_name, query_vector=vector, limit=args.k, search_params=production_params)
+        production_ms.append((time.perf_counter() - start) * 1000)
+
+        expected = {point.id for point in exact}
+        recall = len(expected & {point.id for point in found}) / len(expected) if expected else 1.0
+        recalls.append(recall)
+        print(f"  {'✓' if recall >= args.min_recall else '⚠'} recall@{args.k} {recall:.2f}  {query}")
+
+    mean_recall = sum(recalls) / len(recalls)
+    dimension_recalls: List[float] = []
+    native_size = NATIVE_DIMENSIONS.get(EMBEDDING_MODEL)
+    if native_size and vector_size() < native_size:
+        print(f"\n📐 {vector_size()} vs {native_size} dimensions ({args.sample} sampled chunks):")
+        native_embeddings = CachedEmbeddings(OpenAIEmbeddings(
+            **{**embeddings_kwargs(), 'dimensions': None},
+            api_key=SecretStr(os.getenv("OPENAI_API_KEY", ""))
+        ))
+        dimension_recalls = dimension_recall(
+            client, collection_name, native_embeddings, queries, vectors, args.k, args.sample
+        )
+        for query, recall in zip(queries, dimension_recalls):
+            print(f"  {'✓' if recall >= args.min_recall else '⚠'} recall@{args.k} {recall:.2f}  {query}")
+        if dimension_recalls:
+            mean_recall = min(mean_recall, sum(dimension_recalls) / len(dimension_recalls))
+
+    points = client.get_collection(collection_name).points_count or 0
+    results = {
+        'collection': collection_name,
+        'points': points,
+        'dimensions': vector_size(),
+        'quantization': VECTOR_QUANTIZATION,
+        'oversampling': QUANTIZATION_OVERSAMPLING,
+        'k': args.k,
+        'queries': len(queries),
+        'quantization_recall_at_k': round(sum(recalls) / len(recalls), 4),
+        'dimension_recall_at_k': (
+            round(sum(dimension_recalls) / len(dimension_recalls), 4) if dimension_recalls else None
+        ),
+        'recall_at_k': round(mean_recall, 4),
+        'vector_memory_mb': round(points * bytes_per_vector() / 1e6, 2),
+        'float32_3072_memory_mb': round(points * 3072 * 4 / 1e6, 2),
+        'exact_p50_ms': round(percentile(exact_ms, 50), 2),
+        'production_p50_ms': round(percentile(production_ms, 50), 2),
+        'production_p95_ms': round(percentile(production_ms, 95), 2),
+    }
+
+    print(f"\n📊 Results:")
+    for key, value in results.items():
+        print(f"  {key}: {value}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved: {args.output}")
+
+    if mean_recall < args.min_recall:
+        print(f"\n❌ Recall {mean_recall:.3f} is below tolerance {args.min_recall}")
+        return 1
+
+    print(f"\n✅ Recall {mean_recall:.3f} within tolerance {args.min_recall}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
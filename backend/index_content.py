@@ -1,212 +1,703 @@
 """
 Index book content to Qdrant vector database for RAG system.
-Reads all markdown files from docs/, chunks them, and creates embeddings.
+Streams every Markdown/MDX file from docs/, blog/ and specs/ through
+parallel parsing and chunking (ingest.py) into the embedding pipeline.
 """
 
 import os
 import sys
+import json
+import argparse
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict
-import re
+from typing import Any, Iterator, List, Dict, Optional, Set
 from pydantic import SecretStr
 
 try:
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
     from langchain_openai import OpenAIEmbeddings
-    from langchain_qdrant import QdrantVectorStore
     from qdrant_client import QdrantClient
-    from qdrant_client.models import Distance, VectorParams
+    from qdrant_client.models import PointStruct, PointIdsList, Disabled
 except ImportError:
     print("ERROR: Required packages not installed.")
     print("Run: pip install -r requirements.txt")
     sys.exit(1)
 
+from embedding_cache import CachedEmbeddings
+from embedding_pipeline import EmbeddingPipeline
+from ingest import INDEX_WORKERS, discover_files, parse_files, source_roots
+from local_vector_store import LocalVectorStore, DEFAULT_LOCAL_STORE_PATH
+from sparse_index import BM25Index, DEFAULT_SPARSE_INDEX_PATH
+from vector_config import (
+    embeddings_kwargs,
+    embedding_signature,
+    vectors_config,
+    quantization_config,
+    create_payload_indexes,
+    alias_target,
+    collection_exists,
+    vector_size,
+    VECTOR_QUANTIZATION,
+    VECTOR_BACKEND,
+    LOCAL_VECTOR_STORE_PATH,
+    LOCAL_VECTOR_DTYPE,
+)
+
+
+# Local record of which chunks are already stored in Qdrant
+DEFAULT_MANIFEST_PATH = Path(__file__).parent / ".index_manifest.json"
+
+# Manifest entries of the batches stored since the manifest was last written
+# (next to it, e.g. .index_manifest.log), folded back in on load
+MANIFEST_LOG_SUFFIX = ".log"
+
+# Vectors embedded by an unfinished local-store run, replayed on the next run
+LOCAL_CHECKPOINT_FILE = "checkpoint.jsonl"
+
+# Defaults for the embedding pipeline (chunks per request, concurrent requests)
+DEFAULT_EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+DEFAULT_EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+
+class IndexingStopped(Exception):
+    """Raised inside a run after stop(); finished batches are already checkpointed"""
+
 
 class ContentIndexer:
     def __init__(
         self,
         openai_api_key: str,
-        qdrant_url: str,
-        qdrant_api_key: str,
-        collection_name: str = "physical_ai_robotics_book"
+        qdrant_url: Optional[str] = None,
+        qdrant_api_key: Optional[str] = None,
+        collection_name: str = "physical_ai_robotics_book",
+        manifest_path: Optional[Path] = None,
+        sparse_index_path: Optional[Path] = None,
+        batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+        concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+        backend: str = VECTOR_BACKEND,
+        local_store_path: Optional[Path] = None
     ):
         """Initialize the content indexer"""
+        self.backend = backend
+        self.local_store_path = Path(local_store_path or LOCAL_VECTOR_STORE_PATH or DEFAULT_LOCAL_STORE_PATH)
         self.collection_name = collection_name
+        # Collection written to; differs from collection_name during a full re-index
+        self.write_collection = collection_name
+        self._full_rebuild = False
         self.qdrant_url = qdrant_url
         self.qdrant_api_key = qdrant_api_key
+        self.manifest_path = Path(manifest_path) if manifest_path else DEFAULT_MANIFEST_PATH
+        self.manifest_log_path = self.manifest_path.with_suffix(MANIFEST_LOG_SUFFIX)
+        self.sparse_index_path = Path(sparse_index_path) if sparse_index_path else DEFAULT_SPARSE_INDEX_PATH
+        self.batch_size = batch_size
+        self.concurrency = concurrency
         
-        # Initialize OpenAI embeddings
-        self.embeddings = OpenAIEmbeddings(
-            api_key=SecretStr(openai_api_key),
-            model="text-embedding-3-large"
-        )
+        # Live counters for whoever is watching the run (see indexing_job.py)
+        self.progress: Dict[str, Any] = {
+            'phase': 'starting',
+            'files': 0,
+            'files_total': 0,
+            'chunks_total': 0,
+            'chunks_to_embed': 0,
+            'chunks_embedded': 0,
+            'chunks_upserted': 0
+        }
+        self._stop = threading.Event()
         
-        # Initialize Qdrant client
-        self.qdrant_client = QdrantClient(
-            url=qdrant_url,
-            api_key=qdrant_api_key
-        )
+        # Initialize OpenAI embeddings behind the shared embedding cache
+        # (retries are handled by EmbeddingPipeline)
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings(
+            api_key=SecretStr(openai_api_key),
+            **embeddings_kwargs(),
+            max_retries=0
+        ))
         
-        # Text splitter for chunking
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n## ", "\n### ", "\n\n", "\n", " ", ""]
-        )
+        # Initialize Qdrant client (the local backend needs no service)
+        self.qdrant_client = None
+        if self.backend != "local":
+            self.qdrant_client = QdrantClient(
+                url=qdrant_url,
+                api_key=qdrant_api_key
+            )
     
-    def read_markdown_files(self, docs_dir: str) -> List[Dict]:
-        """Read all markdown files from docs directory"""
-        docs_path = Path(docs_dir)
-        documents = []
+    def create_collection(self):
+        """
+        Start a full re-index into a fresh collection
         
-        for md_file in docs_path.rglob("*.md"):
-            try:
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Extract metadata from frontmatter
-                metadata = self.extract_metadata(content)
-                
-                # Remove frontmatter from content
-                content = self.remove_frontmatter(content)
-                
-                # Store document with metadata
-                documents.append({
-                    'content': content,
-                    'metadata': {
-                        **metadata,
-                        'source': str(md_file.relative_to(docs_path.parent)),
-                        'filename': md_file.name,
-                        'module': self.extract_module(md_file)
-                    }
-                })
-                
-                print(f"✓ Read: {md_file.name}")
+        The served collection stays untouched until the new one is complete;
+        index_chunks() then points the collection name (an alias) at it and
+        deletes the old one. The local store is likewise only replaced when
+        the run finishes.
+        """
+        if self.backend == "local":
+            # Re-embed everything; the store itself is rewritten atomically at the end
+            self._full_rebuild = True
+            (self.local_store_path / LOCAL_CHECKPOINT_FILE).unlink(missing_ok=True)
+            print(f"✓ Rebuilding local vector store: {self.local_store_path}")
+            return
+        
+        try:
+            stale = self._unpublished_rebuild()
+            if stale is not None:
+                print(f"Dropping unfinished re-index: {stale}")
+                self.qdrant_client.delete_collection(stale)
             
-            except Exception as e:
-                print(f"✗ Error reading {md_file}: {e}")
+            self.write_collection = f"{self.collection_name}_{int(time.time())}"
+            self._create_collection()
+            
+            # Nothing is stored in the new collection yet
+            self.save_manifest(self._empty_manifest())
         
-        return documents
+        except Exception as e:
+            print(f"✗ Error creating collection: {e}")
+            raise
     
-    def extract_metadata(self, content: str) -> Dict:
-        """Extract metadata from markdown frontmatter"""
-        metadata = {}
+    def ensure_collection(self):
+        """Create the Qdrant collection only if it doesn't exist (incremental re-index)"""
+        if self.backend == "local":
+            print(f"✓ Using local vector store: {self.local_store_path}")
+            return
         
-        # Match YAML frontmatter
-        frontmatter_match = re.match(r'^---\n(.*?)\n---', content, re.DOTALL)
-        if frontmatter_match:
-            frontmatter = frontmatter_match.group(1)
+        try:
+            # Resume a full re-index that was interrupted before it was published
+            rebuild = self._unpublished_rebuild()
+            if rebuild is not None:
+                self.write_collection = rebuild
+                print(f"✓ Resuming full re-index into: {rebuild}")
+                return
+            
+            if collection_exists(self.qdrant_client, self.collection_name):
+                if not self._embedding_matches():
+                    print("Embedding model or dimensions changed. Recreating collection...")
+                    self.create_collection()
+                    return
+                
+                self._sync_quantization()
+                create_payload_indexes(self.qdrant_client, self.collection_name)
+                print(f"✓ Using existing collection: {self.collection_name}")
+                return
             
-            # Extract title
-            title_match = re.search(r'title:\s*(.+)', frontmatter)
-            if title_match:
-                metadata['title'] = title_match.group(1).strip('"\'')
+            self._create_collection()
             
-            # Extract sidebar_position
-            pos_match = re.search(r'sidebar_position:\s*(\d+)', frontmatter)
-            if pos_match:
-                metadata['sidebar_position'] = int(pos_match.group(1))
-        
-        # Extract first heading as title if not in frontmatter
-        if 'title' not in metadata:
-            heading_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-            if heading_match:
-                metadata['title'] = heading_match.group(1)
-        
-        return metadata
-    
-    def remove_frontmatter(self, content: str) -> str:
-        """Remove YAML frontmatter from content"""
-        return re.sub(r'^---\n.*?\n---\n', '', content, flags=re.DOTALL)
-    
-    def extract_module(self, file_path: Path) -> str:
-        """Extract module name from file path"""
-        parts = file_path.parts
-        for part in parts:
-            if part.startswith('module-'):
-                return part
-        
-        if 'intro.md' in str(file_path):
-            return 'introduction'
-        elif 'hardware.md' in str(file_path):
-            return 'hardware'
-        elif 'setup.md' in str(file_path):
-            return 'setup'
-        elif 'faq.md' in str(file_path):
-            return 'faq'
-        
-        return 'general'
+            # A fresh collection invalidates whatever the manifest remembers
+            self.save_manifest(self._empty_manifest())
+        
+        except Exception as e:
+            print(f"✗ Error preparing collection: {e}")
+            raise
     
-    def create_collection(self):
-        """Create Qdrant collection if it doesn't exist"""
+    def _create_collection(self):
+        """Create the collection with the embedding vector configuration"""
+        self.qdrant_client.create_collection(
+            collection_name=self.write_collection,
+            vectors_config=vectors_config(),
+            quantization_config=quantization_config()
+        )
+        create_payload_indexes(self.qdrant_client, self.write_collection)
+        print(f"✓ Created collection: {self.write_collection} "
+              f"({vector_size()} dims, quantization: {VECTOR_QUANTIZATION})")
+    
+    def _embedding_matches(self) -> bool:
+        """True if stored vectors were made with the configured model and size"""
+        info = self.qdrant_client.get_collection(self.write_collection)
+        stored_size = getattr(info.config.params.vectors, 'size', None)
+        if stored_size != vector_size():
+            return False
+        return self.load_manifest().get('embedding') == embedding_signature()
+    
+    def _sync_quantization(self):
+        """Apply a changed VECTOR_QUANTIZATION setting without re-embedding"""
+        info = self.qdrant_client.get_collection(self.write_collection)
+        desired = quantization_config()
+        if type(info.config.quantization_config) is type(desired):
+            return
+        
+        self.qdrant_client.update_collection(
+            collection_name=self.write_collection,
+            quantization_config=desired if desired is not None else Disabled.DISABLED
+        )
+        print(f"✓ Updated quantization: {VECTOR_QUANTIZATION}")
+    
+    def _empty_manifest(self) -> Dict:
+        """Manifest describing an empty collection"""
+        return {
+            'collection': self.write_collection,
+            'embedding': embedding_signature(),
+            'points': {}
+        }
+    
+    def load_manifest(self) -> Dict:
+        """Load the manifest of chunks already stored in Qdrant"""
+        if not self.manifest_path.exists():
+            return self._empty_manifest()
+        
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Ignoring unreadable manifest {self.manifest_path}: {e}")
+            return self._empty_manifest()
+        
+        # A manifest written for another collection tells us nothing
+        if manifest.get('collection') != self.write_collection:
+            return self._empty_manifest()
+        
+        manifest.setdefault('points', {})
+        # Manifests from before EMBEDDING_MODEL/EMBEDDING_DIMENSIONS were configurable
+        manifest.setdefault('embedding', {'model': 'text-embedding-3-large', 'dimensions': 3072})
+        manifest['points'].update(self._load_manifest_log(manifest))
+        return manifest
+    
+    def _load_manifest_log(self, manifest: Dict) -> Dict[str, Dict]:
+        """Entries an interrupted run appended for the same collection and embedding settings"""
+        entries: Dict[str, Dict] = {}
+        try:
+            with open(self.manifest_log_path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or "{}")
+                if (header.get('collection') != manifest['collection']
+                        or header.get('embedding') != manifest['embedding']):
+                    return {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn last line from the interruption
+                    entries[entry['id']] = entry['entry']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Ignoring unreadable manifest log {self.manifest_log_path}: {e}")
+        return entries
+    
+    def _append_manifest_log(self, manifest: Dict, entries: Dict[str, Dict]):
+        """Record entries without rewriting the whole manifest (caller holds the manifest lock)"""
+        with open(self.manifest_log_path, 'a', encoding='utf-8') as f:
+            if f.tell() == 0:
+                f.write(json.dumps({
+                    'collection': manifest['collection'],
+                    'embedding': manifest['embedding']
+                }) + "\n")
+            for point_id, entry in entries.items():
+                f.write(json.dumps({'id': point_id, 'entry': entry}) + "\n")
+    
+    def _unpublished_rebuild(self) -> Optional[str]:
+        """Collection of an unfinished full re-index recorded in the manifest, if it still exists"""
+        if not self.manifest_path.exists():
+            return None
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                collection = json.load(f).get('collection')
+        except (OSError, ValueError):
+            return None
+        
+        if not collection or not collection.startswith(f"{self.collection_name}_"):
+            return None
+        if alias_target(self.qdrant_client, self.collection_name) == collection:
+            return None
+        names = {c.name for c in self.qdrant_client.get_collections().collections}
+        return collection if collection in names else None
+    
+    def _publish_collection(self, manifest: Dict):
+        """Point the collection name at a finished full re-index and drop the old collection"""
+        from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+        
+        previous = alias_target(self.qdrant_client, self.collection_name)
+        operations = []
+        if previous is not None:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.collection_name)))
+        elif collection_exists(self.qdrant_client, self.collection_name):
+            # Indexed before full re-indexes used aliases: the name is a real collection
+            previous = self.collection_name
+            self.qdrant_client.delete_collection(self.collection_name)
+        operations.append(CreateAliasOperation(create_alias=CreateAlias(
+            collection_name=self.write_collection,
+            alias_name=self.collection_name
+        )))
+        self.qdrant_client.update_collection_aliases(change_aliases_operations=operations)
+        if previous is not None and previous != self.collection_name:
+            self.qdrant_client.delete_collection(previous)
+        print(f"✓ Published {self.write_collection} as {self.collection_name}")
+        
+        self.write_collection = self.collection_name
+        manifest['collection'] = self.collection_name
+        self.save_manifest(manifest)
+    
+    def save_manifest(self, manifest: Dict):
+        """Atomically write the manifest, folding in (and dropping) the log"""
+        # Dropped first: a crash in between only loses progress, never claims points
+        self.manifest_log_path.unlink(missing_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def index_sources(self, roots: Optional[List[Path]] = None, workers: int = INDEX_WORKERS) -> int:
+        """
+        Stream every Markdown/MDX file under roots (default: INDEX_SOURCES)
+        into the vector store
+        
+        Files are parsed and chunked in `workers` processes and their chunks
+        flow straight into the embedding pipeline, so only a bounded window
+        of files and batches is held in memory at a time.
+        
+        Returns:
+            Number of chunks embedded
+        """
+        roots = roots if roots is not None else source_roots()
+        print(f"📂 Sources: {', '.join(str(root) for root in roots)}")
+        
+        # Paths are cheap to list up front and give the job a total for its ETA
+        files = list(discover_files(roots))
+        self.progress['files_total'] = len(files)
+        if not files:
+            raise ValueError("No Markdown/MDX files found")
+        
+        # Sources that couldn't be read keep their stored chunks this run
+        failed_sources: Set[str] = set()
+        
+        def chunks() -> Iterator[Dict]:
+            for parsed in parse_files(files, workers=workers):
+                if 'error' in parsed:
+                    print(f"✗ Error reading {parsed['path']}: {parsed['error']}")
+                    failed_sources.add(parsed['source'])
+                    continue
+                self.progress['files'] += 1
+                yield from parsed['chunks']
+        
+        return self.index_chunks(chunks(), failed_sources)
+    
+    def index_chunks(self, chunks: Iterator[Dict], failed_sources: Optional[Set[str]] = None) -> int:
+        """
+        Sync a stream of chunks to Qdrant (or the local store)
+        
+        Only chunks missing from the manifest are embedded and upserted.
+        Unchanged chunks whose metadata moved (e.g. chunk_id shifted by an
+        inserted chunk) only get their payload rewritten, and points no
+        longer produced by any document are deleted. The BM25 index is
+        built from the same pass.
+        
+        Args:
+            failed_sources: Sources that failed to parse (filled while the
+                stream is consumed); their stored chunks are kept, not orphaned
+        
+        Returns:
+            Number of chunks embedded
+        """
+        failed_sources = failed_sources if failed_sources is not None else set()
+        if self.backend == "local":
+            return self._index_local(chunks, failed_sources)
+        
+        manifest = self.load_manifest()
+        indexed = manifest['points']
+        manifest_lock = threading.Lock()
+        sparse = BM25Index()
+        current_ids = set()
+        moved = 0
+        
+        def new_chunks() -> Iterator[Dict]:
+            nonlocal moved
+            for c in chunks:
+                if c['id'] in current_ids:
+                    continue
+                current_ids.add(c['id'])
+                sparse.add(c['id'], c['text'], c['metadata'])
+                self.progress['chunks_total'] += 1
+                
+                entry = indexed.get(c['id'])
+                if entry is None:
+                    self.progress['chunks_to_embed'] += 1
+                    yield c
+                elif entry.get('metadata_hash') != c['metadata_hash']:
+                    self.qdrant_client.overwrite_payload(
+                        collection_name=self.write_collection,
+                        payload=self._payload(c),
+                        points=[c['id']]
+                    )
+                    with manifest_lock:
+                        indexed[c['id']] = self._manifest_entry(c)
+                        self._append_manifest_log(manifest, {c['id']: indexed[c['id']]})
+                    moved += 1
+        
+        print(f"\n🔄 Streaming to Qdrant "
+              f"(batch size {self.batch_size}, concurrency {self.concurrency})...")
         try:
-            # Check if collection exists
-            collections = self.qdrant_client.get_collections().collections
-            collection_names = [c.name for c in collections]
+            def record_batch(batch: List[Dict]):
+                # Record progress so an interrupted run doesn't redo this batch;
+                # the manifest itself is only rewritten once the run is finished
+                entries = {c['id']: self._manifest_entry(c) for c in batch}
+                with manifest_lock:
+                    indexed.update(entries)
+                    self._append_manifest_log(manifest, entries)
+                self.progress['chunks_upserted'] += len(batch)
+                print(f"  ✓ Upserted {self.progress['chunks_upserted']} chunks")
+            
+            self.progress['phase'] = 'embedding'
+            pipeline = EmbeddingPipeline(
+                embeddings=self.embeddings,
+                upsert_fn=self._upsert_batch,
+                batch_size=self.batch_size,
+                concurrency=self.concurrency
+            )
+            stats = pipeline.run(new_chunks(), on_batch_done=record_batch, on_batch_embedded=self._count_embedded)
             
-            if self.collection_name in collection_names:
-                print(f"Collection '{self.collection_name}' already exists. Deleting...")
-                self.qdrant_client.delete_collection(self.collection_name)
+            if stats['chunks']:
+                cache = self.embeddings.stats()
+                print(f"  ⏱  {stats['chunks']} chunks in {stats['seconds']}s "
+                      f"({stats['chunks_per_sec']} chunks/sec, {stats['retries']} retries, "
+                      f"{stats['rate_limited']} rate-limited, final concurrency {stats['final_concurrency']})")
+                print(f"  💾 Embedding cache: {cache['memory_hits'] + cache['disk_hits']} hits, "
+                      f"{cache['misses']} misses")
             
-            # Create new collection
-            self.qdrant_client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=3072,  # text-embedding-3-large dimension
-                    distance=Distance.COSINE
+            self.progress['phase'] = 'finalizing'
+            self._check_rebuild_complete(failed_sources)
+            orphan_ids = [
+                point_id for point_id, entry in indexed.items()
+                if point_id not in current_ids and entry.get('source') not in failed_sources
+            ]
+            if orphan_ids:
+                self.qdrant_client.delete(
+                    collection_name=self.write_collection,
+                    points_selector=PointIdsList(points=orphan_ids)
                 )
-            )
-            print(f"✓ Created collection: {self.collection_name}")
+                for point_id in orphan_ids:
+                    del indexed[point_id]
+            
+            self.save_manifest(manifest)
+            if self.write_collection != self.collection_name:
+                self._publish_collection(manifest)
+            self._print_statistics(len(current_ids), stats['chunks'], metadata_only=moved, orphaned=len(orphan_ids))
+            print(f"✓ Index in sync: {stats['chunks']} embedded, {len(orphan_ids)} removed")
+            
+            self._keep_sparse_entries(sparse, failed_sources, current_ids)
+            self._save_sparse_index(sparse)
+            self.progress['phase'] = 'done'
+            return stats['chunks']
         
         except Exception as e:
-            print(f"✗ Error creating collection: {e}")
+            print(f"✗ Error indexing documents: {e}")
             raise
     
-    def index_documents(self, documents: List[Dict]):
-        """Chunk and index documents to Qdrant"""
-        all_texts = []
-        all_metadatas = []
+    def _index_local(self, chunks: Iterator[Dict], failed_sources: Set[str]) -> int:
+        """
+        Rewrite the local vector store from a stream of chunks
         
-        for doc in documents:
-            # Split content into chunks
-            chunks = self.text_splitter.split_text(doc['content'])
-            
-            for i, chunk in enumerate(chunks):
-                all_texts.append(chunk)
-                all_metadatas.append({
-                    **doc['metadata'],
-                    'chunk_id': i,
-                    'total_chunks': len(chunks)
-                })
+        Vectors of chunks already in the previous store are reused as long
+        as it was built with the same embedding model and dimensions. Each
+        embedded batch is appended to a checkpoint file first, so an
+        interrupted run only re-embeds the batches it hadn't finished.
         
-        print(f"\n📊 Statistics:")
-        print(f"  Documents: {len(documents)}")
-        print(f"  Total chunks: {len(all_texts)}")
-        print(f"  Avg chunks per doc: {len(all_texts) / len(documents):.1f}")
+        Returns:
+            Number of chunks embedded
+        """
+        previous = None
+        try:
+            previous = LocalVectorStore.load(self.local_store_path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Ignoring unreadable local store {self.local_store_path}: {e}")
+        if previous is not None and self._full_rebuild:
+            previous = None
+        if previous is not None and previous.embedding != embedding_signature():
+            print("Embedding model or dimensions changed. Re-embedding everything...")
+            previous = None
+        
+        checkpoint = self._load_local_checkpoint()
+        checkpoint_path = self.local_store_path / LOCAL_CHECKPOINT_FILE
+        if not checkpoint:
+            self.local_store_path.mkdir(parents=True, exist_ok=True)
+            with open(checkpoint_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'embedding': embedding_signature()}) + "\n")
+        
+        # The store itself: every chunk's ID, payload and vector, in stream order
+        ids: List[str] = []
+        payloads: List[Dict] = []
+        vectors: Dict[str, List[float]] = {}
+        seen = set()
+        sparse = BM25Index()
+        reused = resumed = 0
         
-        # Create vector store and index
-        print(f"\n🔄 Indexing to Qdrant...")
+        def new_chunks() -> Iterator[Dict]:
+            nonlocal reused, resumed
+            for c in chunks:
+                if c['id'] in seen:
+                    continue
+                seen.add(c['id'])
+                ids.append(c['id'])
+                payloads.append(self._payload(c))
+                sparse.add(c['id'], c['text'], c['metadata'])
+                self.progress['chunks_total'] += 1
+                
+                vector = previous.vector(c['id']) if previous is not None else None
+                if vector is not None:
+                    vectors[c['id']] = vector.tolist()
+                    reused += 1
+                elif c['id'] in checkpoint:
+                    vectors[c['id']] = checkpoint.pop(c['id'])
+                    resumed += 1
+                else:
+                    self.progress['chunks_to_embed'] += 1
+                    yield c
+        
+        print(f"\n🔄 Streaming into local store "
+              f"(batch size {self.batch_size}, concurrency {self.concurrency})...")
         try:
-            vector_store = QdrantVectorStore.from_texts(
-                texts=all_texts,
-                embedding=self.embeddings,
-                metadatas=all_metadatas,
-                url=self.qdrant_url,
-                api_key=self.qdrant_api_key,
-                collection_name=self.collection_name,
-                force_recreate=False
+            def collect_batch(batch: List[Dict], batch_vectors: List[List[float]]):
+                with open(checkpoint_path, 'a', encoding='utf-8') as f:
+                    for c, vector in zip(batch, batch_vectors):
+                        vectors[c['id']] = vector
+                        f.write(json.dumps({'id': c['id'], 'vector': vector}) + "\n")
+                self.progress['chunks_upserted'] += len(batch)
+            
+            self.progress['phase'] = 'embedding'
+            pipeline = EmbeddingPipeline(
+                embeddings=self.embeddings,
+                upsert_fn=collect_batch,
+                batch_size=self.batch_size,
+                concurrency=self.concurrency
             )
-            print(f"✓ Successfully indexed {len(all_texts)} chunks!")
-            return vector_store
+            stats = pipeline.run(new_chunks(), on_batch_embedded=self._count_embedded)
+            if stats['chunks']:
+                print(f"  ⏱  {stats['chunks']} chunks in {stats['seconds']}s "
+                      f"({stats['chunks_per_sec']} chunks/sec)")
+            
+            self.progress['phase'] = 'finalizing'
+            self._check_rebuild_complete(failed_sources)
+            if previous is not None and failed_sources:
+                print(f"⚠ Keeping the indexed chunks of {len(failed_sources)} unreadable file(s): "
+                      f"{', '.join(sorted(failed_sources))}")
+                for row, point_id in enumerate(previous.ids):
+                    payload = previous.payloads[row]
+                    metadata = payload.get('metadata') or {}
+                    if point_id not in seen and metadata.get('source') in failed_sources:
+                        seen.add(point_id)
+                        ids.append(point_id)
+                        payloads.append(payload)
+                        vectors[point_id] = previous.vector(point_id).tolist()
+                        sparse.add(point_id, payload.get('page_content', ''), metadata)
+            self._print_statistics(len(ids), stats['chunks'], reused=reused, resumed=resumed)
+            LocalVectorStore.write(
+                self.local_store_path,
+                ids=ids,
+                vectors=[vectors[point_id] for point_id in ids],
+                payloads=payloads,
+                dtype=LOCAL_VECTOR_DTYPE,
+                embedding=embedding_signature()
+            )
+            print(f"✓ Local store written: {len(ids)} vectors ({LOCAL_VECTOR_DTYPE}) → {self.local_store_path}")
+            checkpoint_path.unlink(missing_ok=True)
+            
+            self._save_sparse_index(sparse)
+            self.progress['phase'] = 'done'
+            return stats['chunks']
         
         except Exception as e:
             print(f"✗ Error indexing documents: {e}")
             raise
     
+    def _print_statistics(self, total: int, embedded: int, **counts: int):
+        """Summary of a finished sync"""
+        files = self.progress['files'] or self.progress.get('files_total', 0)
+        print(f"\n📊 Statistics:")
+        print(f"  Documents: {files}")
+        print(f"  Total chunks: {total}")
+        if files:
+            print(f"  Avg chunks per doc: {total / files:.1f}")
+        print(f"  New/changed chunks: {embedded}")
+        for name, count in counts.items():
+            print(f"  {name.replace('_', ' ').capitalize()}: {count}")
+    
+    def _load_local_checkpoint(self) -> Dict[str, List[float]]:
+        """Vectors saved by an interrupted local run with the same embedding settings"""
+        path = self.local_store_path / LOCAL_CHECKPOINT_FILE
+        vectors: Dict[str, List[float]] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get('embedding') != embedding_signature():
+                    return {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn last line from the interruption
+                    vectors[entry['id']] = entry['vector']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Ignoring unreadable checkpoint {path}: {e}")
+        return vectors
+    
+    def _count_embedded(self, batch: List[Dict]):
+        self.progress['chunks_embedded'] += len(batch)
+        if self._stop.is_set():
+            raise IndexingStopped("Indexing stopped")
+    
+    def stop(self):
+        """Ask a running index_sources() to stop after the current batches"""
+        self._stop.set()
+    
+    def _check_rebuild_complete(self, failed_sources: Set[str]):
+        """A full re-index missing some files must not replace the served index"""
+        rebuilding = self._full_rebuild or self.write_collection != self.collection_name
+        if rebuilding and failed_sources:
+            raise RuntimeError(
+                f"{len(failed_sources)} file(s) could not be read; the full re-index was not published"
+            )
+    
+    def _keep_sparse_entries(self, index: BM25Index, failed_sources: Set[str], current_ids: Set[str]):
+        """Carry the previous BM25 entries of sources that failed to parse into index"""
+        if not failed_sources:
+            return
+        print(f"⚠ Keeping the indexed chunks of {len(failed_sources)} unreadable file(s): "
+              f"{', '.join(sorted(failed_sources))}")
+        try:
+            previous = BM25Index.load(self.sparse_index_path)
+        except (OSError, ValueError, KeyError):
+            return
+        for doc_id, payload in zip(previous.ids, previous.payloads):
+            metadata = payload.get('metadata') or {}
+            if doc_id not in current_ids and metadata.get('source') in failed_sources:
+                index.add(doc_id, payload.get('page_content', ''), metadata)
+    
+    def _save_sparse_index(self, index: BM25Index):
+        """Finish and save a BM25 index filled while streaming"""
+        self.progress['phase'] = 'sparse_index'
+        index.finish().save(self.sparse_index_path)
+        print(f"✓ BM25 index: {len(index)} chunks, {len(index.postings)} terms → {self.sparse_index_path.name}")
+    
+    def _upsert_batch(self, batch: List[Dict], vectors: List[List[float]]):
+        """Write one embedded batch to Qdrant"""
+        self.qdrant_client.upsert(
+            collection_name=self.write_collection,
+            points=[
+                PointStruct(id=c['id'], vector=vector, payload=self._payload(c))
+                for c, vector in zip(batch, vectors)
+            ]
+        )
+    
+    @staticmethod
+    def _payload(chunk: Dict) -> Dict:
+        """Qdrant payload in the layout QdrantVectorStore reads back"""
+        return {'page_content': chunk['text'], 'metadata': chunk['metadata']}
+    
+    @staticmethod
+    def _manifest_entry(chunk: Dict) -> Dict:
+        """What the manifest remembers about a stored chunk"""
+        return {
+            'source': chunk['metadata'].get('source', ''),
+            'content_hash': chunk['content_hash'],
+            'metadata_hash': chunk['metadata_hash']
+        }
+    
     def verify_index(self):
         """Verify that documents were indexed correctly"""
         try:
+            if self.backend == "local":
+                point_count = len(LocalVectorStore.load(self.local_store_path))
+                print(f"\n✓ Verification: {point_count} vectors in local store")
+                return point_count > 0
+            
             collection_info = self.qdrant_client.get_collection(self.collection_name)
             point_count = collection_info.points_count
             print(f"\n✓ Verification: {point_count} points in collection")
@@ -219,6 +710,32 @@ class ContentIndexer:
 
 def main():
     """Main indexing function"""
+    parser = argparse.ArgumentParser(description="Index book content to Qdrant")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Delete and recreate the collection, re-embedding every chunk"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_EMBED_BATCH_SIZE,
+        help="Chunks per embedding request (env: EMBED_BATCH_SIZE)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_EMBED_CONCURRENCY,
+        help="Maximum concurrent embedding requests (env: EMBED_CONCURRENCY)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=INDEX_WORKERS,
+        help="Parser processes (env: INDEX_WORKERS, default one per core)"
+    )
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("📚 Physical AI & Robotics Book - Content Indexer")
     print("=" * 60)
@@ -231,49 +748,50 @@ def main():
     qdrant_url = os.getenv("QDRANT_URL")
     qdrant_api_key = os.getenv("QDRANT_API_KEY")
     
-    # Validate
-    if not all([openai_api_key, qdrant_url, qdrant_api_key]):
+    # Validate (the local backend doesn't need Qdrant credentials)
+    required = [openai_api_key] if VECTOR_BACKEND == "local" else [openai_api_key, qdrant_url, qdrant_api_key]
+    if not all(required):
         print("\n❌ ERROR: Missing environment variables!")
-        print("Required: OPENAI_API_KEY, QDRANT_URL, QDRANT_API_KEY")
+        if VECTOR_BACKEND == "local":
+            print("Required: OPENAI_API_KEY")
+        else:
+            print("Required: OPENAI_API_KEY, QDRANT_URL, QDRANT_API_KEY")
         print("\nPlease create backend/.env with these values.")
         sys.exit(1)
     
     # Type assertions after validation
     assert openai_api_key is not None
-    assert qdrant_url is not None
-    assert qdrant_api_key is not None
     
     # Initialize indexer
     indexer = ContentIndexer(
         openai_api_key=openai_api_key,
         qdrant_url=qdrant_url,
-        qdrant_api_key=qdrant_api_key
+        qdrant_api_key=qdrant_api_key,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency
     )
     
-    # Get docs directory (parent of backend)
-    backend_dir = Path(__file__).parent
-    docs_dir = backend_dir.parent / "docs"
+    # Content directories (INDEX_SOURCES, relative to the repository root)
+    roots = source_roots()
     
-    if not docs_dir.exists():
-        print(f"\n❌ ERROR: Docs directory not found: {docs_dir}")
+    if not roots:
+        print("\n❌ ERROR: No content directories found (INDEX_SOURCES)!")
         sys.exit(1)
     
-    print(f"\n📂 Reading from: {docs_dir}")
-    
-    # Read documents
-    documents = indexer.read_markdown_files(str(docs_dir))
+    # Set up collection (incremental runs keep what's already indexed)
+    print(f"\n🗃️  Setting up {'local vector store' if VECTOR_BACKEND == 'local' else 'Qdrant collection'}...")
+    if args.full:
+        indexer.create_collection()
+    else:
+        indexer.ensure_collection()
     
-    if not documents:
-        print("\n❌ ERROR: No documents found!")
+    # Stream documents into the index
+    try:
+        indexer.index_sources(roots, workers=args.workers)
+    except ValueError as e:
+        print(f"\n❌ ERROR: {e}")
         sys.exit(1)
     
-    # Create collection
-    print(f"\n🗃️  Setting up Qdrant collection...")
-    indexer.create_collection()
-    
-    # Index documents
-    indexer.index_documents(documents)
-    
     # Verify
     if indexer.verify_index():
         print("\n✅ SUCCESS! All content indexed.")
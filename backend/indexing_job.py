@@ -0,0 +1,134 @@
+"""
+Background re-indexing started from the API.
+Runs ContentIndexer on a worker thread, off the request path, and reports
+its progress (files read, chunks embedded and upserted, ETA) for
+/api/embeddings/status. The indexer checkpoints after every batch, so a job
+that crashed or was stopped resumes where it left off when started again.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sparse_index import DEFAULT_SPARSE_INDEX_PATH
+
+
+class IndexingJob:
+    """At most one indexing run per process, plus the state of the last one"""
+
+    def __init__(self):
+        self.state: Dict[str, Any] = {'status': 'idle'}
+        self._indexer = None
+        self._task: Optional[asyncio.Task] = None
+        self._started = 0.0
+
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, full: bool = False, on_complete: Optional[Callable[[], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """
+        Start a run in the background
+
+        Args:
+            full: Recreate the collection and re-embed everything
+            on_complete: Awaited after a successful run (e.g. to reload the RAG system);
+                its failure is reported as reload_error, not as a failed run
+        """
+        if self.running():
+            raise RuntimeError("An indexing job is already running")
+
+        self._indexer = None
+        self._started = time.monotonic()
+        self.state = {
+            'status': 'running',
+            'job_id': uuid.uuid4().hex,
+            'full': full,
+            'started_at': datetime.utcnow().isoformat(),
+            'finished_at': None,
+            'reload_error': None
+        }
+        self._task = asyncio.create_task(self._run(full, on_complete))
+        return self.status()
+
+    async def stop(self):
+        """Stop a running job at the next batch boundary and wait for it (shutdown)"""
+        if not self.running():
+            return
+        if self._indexer is not None:
+            self._indexer.stop()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self, full: bool, on_complete: Optional[Callable[[], Awaitable[None]]]):
+        try:
+            result = await asyncio.to_thread(self._index, full)
+        except Exception as e:
+            from index_content import IndexingStopped
+            
+            status = 'stopped' if isinstance(e, IndexingStopped) else 'failed'
+            print(f"✗ Indexing job {status}: {e}")
+            self.state.update(status=status, error=str(e), finished_at=datetime.utcnow().isoformat())
+            return
+        
+        # The index is written either way; a failed reload only means it isn't served yet
+        self.state.update(status='succeeded', finished_at=datetime.utcnow().isoformat(), **result)
+        if on_complete is not None:
+            try:
+                await on_complete()
+            except Exception as e:
+                print(f"✗ Reload after indexing failed: {e}")
+                self.state['reload_error'] = str(e)
+
+    def _index(self, full: bool) -> Dict[str, Any]:
+        """Blocking indexing run (worker thread)"""
+        from index_content import ContentIndexer
+
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY is not set")
+
+        indexer = ContentIndexer(
+            openai_api_key=openai_api_key,
+            qdrant_url=os.getenv("QDRANT_URL"),
+            qdrant_api_key=os.getenv("QDRANT_API_KEY"),
+            sparse_index_path=Path(os.getenv("SPARSE_INDEX_PATH", str(DEFAULT_SPARSE_INDEX_PATH)))
+        )
+        self._indexer = indexer
+
+        if full:
+            indexer.create_collection()
+        else:
+            indexer.ensure_collection()
+        embedded = indexer.index_sources()
+
+        return {
+            'documents_indexed': indexer.progress['files'],
+            'chunks_indexed': indexer.progress['chunks_total'],
+            'chunks_embedded': embedded
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Job state with live progress and, while embedding, an ETA in seconds"""
+        state = dict(self.state)
+        if self._indexer is None:
+            return state
+
+        progress = dict(self._indexer.progress)
+        state['progress'] = progress
+        if self.running():
+            elapsed = time.monotonic() - self._started
+            files, files_total = progress['files'], progress['files_total']
+            done = progress['chunks_upserted']
+            remaining = progress['chunks_to_embed'] - done
+            if 0 < files < files_total:
+                # Still streaming: chunk totals aren't known yet, files are
+                state['eta_seconds'] = round(elapsed * (files_total - files) / files, 1)
+            else:
+                state['eta_seconds'] = round(remaining * elapsed / done, 1) if done and remaining > 0 else None
+        return state
+
+
+indexing_job = IndexingJob()
@@ -0,0 +1,236 @@
+"""
+Streaming document ingestion for the content indexer.
+Files are discovered lazily and parsed/chunked in a process pool with a
+bounded number of files in flight; chunks come out as a generator that the
+embedding pipeline batches, embeds and upserts. Only a bounded window of
+parsed files and batches is buffered at a time (the BM25 index and the set of
+seen chunk IDs still grow with the corpus), and parsing scales with the
+number of cores.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chunker import MarkdownChunker
+
+REPO_ROOT = Path(__file__).parent.parent
+
+# Content trees indexed together, relative to the repository root
+INDEX_SOURCES = [name.strip() for name in os.getenv("INDEX_SOURCES", "docs,blog,specs").split(",") if name.strip()]
+
+# Parser processes (0 = one per core)
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "0")) or os.cpu_count() or 1
+
+DOC_SUFFIXES = (".md", ".mdx")
+
+# Namespace for deterministic chunk point IDs (uuid5 of source + content hash)
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c3b52-8e0a-4d7e-9a55-2f4c1d9b7e10")
+
+
+def source_roots(names: Optional[Iterable[str]] = None) -> List[Path]:
+    """Existing content directories among names (default: INDEX_SOURCES)"""
+    roots = [REPO_ROOT / name for name in (names or INDEX_SOURCES)]
+    return [root for root in roots if root.is_dir()]
+
+
+def discover_files(roots: Iterable[Path]) -> Iterator[Tuple[Path, Path]]:
+    """(file, root) for every Markdown/MDX file under the roots, in a stable order"""
+    for root in roots:
+        for path in sorted(root.rglob("*")):
+            if path.suffix in DOC_SUFFIXES and path.is_file():
+                yield path, root
+
+
+# ============================================================================
+# Parsing (runs in worker processes)
+# ============================================================================
+
+def extract_metadata(content: str) -> Dict:
+    """Extract metadata from markdown frontmatter"""
+    metadata = {}
+
+    # Match YAML frontmatter
+    frontmatter_match = re.match(r'^---\n(.*?)\n---', content, re.DOTALL)
+    if frontmatter_match:
+        frontmatter = frontmatter_match.group(1)
+
+        # Extract title
+        title_match = re.search(r'title:\s*(.+)', frontmatter)
+        if title_match:
+            metadata['title'] = title_match.group(1).strip('"\'')
+
+        # Extract sidebar_position
+        pos_match = re.search(r'sidebar_position:\s*(\d+)', frontmatter)
+        if pos_match:
+            metadata['sidebar_position'] = int(pos_match.group(1))
+
+    # Extract first heading as title if not in frontmatter
+    if 'title' not in metadata:
+        heading_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+        if heading_match:
+            metadata['title'] = heading_match.group(1)
+
+    return metadata
+
+
+def remove_frontmatter(content: str) -> str:
+    """Remove YAML frontmatter from content"""
+    return re.sub(r'^---\n.*?\n---\n', '', content, flags=re.DOTALL)
+
+
+def extract_module(file_path: Path) -> str:
+    """Extract module name from file path"""
+    parts = file_path.parts
+    for part in parts:
+        if part.startswith('module-'):
+            return part
+
+    if 'intro.md' in str(file_path):
+        return 'introduction'
+    elif 'hardware.md' in str(file_path):
+        return 'hardware'
+    elif 'setup.md' in str(file_path):
+        return 'setup'
+    elif 'faq.md' in str(file_path):
+        return 'faq'
+
+    return 'general'
+
+
+def extract_chapter(file_path: Path, root: Path) -> str:
+    """
+    Page slug as it appears in the site URL (e.g. module-1/week-1)
+
+    Docs live at the site's docs root; other trees keep their directory
+    name (blog/..., specs/...).
+    """
+    slug = file_path.relative_to(root).with_suffix('').as_posix()
+    return slug if root.name == "docs" else f"{root.name}/{slug}"
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a string"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_point_id(source: str, text_hash: str) -> str:
+    """Deterministic Qdrant point ID for a chunk of a source file"""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source}:{text_hash}"))
+
+
+def document_chunks(document: Dict, chunker: MarkdownChunker) -> List[Dict]:
+    """Chunks of one document with deterministic IDs, metadata and hashes"""
+    source = document['metadata'].get('source', '')
+    pieces = chunker.chunk(document['content'])
+    chunks = []
+    seen_ids = set()
+
+    for i, piece in enumerate(pieces):
+        text = piece['text']
+        text_hash = content_hash(text)
+        point_id = chunk_point_id(source, text_hash)
+
+        # Identical chunks in the same file map to the same point
+        if point_id in seen_ids:
+            continue
+        seen_ids.add(point_id)
+
+        metadata = {
+            **document['metadata'],
+            'chunk_id': i,
+            'total_chunks': len(pieces),
+            'heading_path': piece['heading_path']
+        }
+        chunks.append({
+            'id': point_id,
+            'text': text,
+            'metadata': metadata,
+            'content_hash': text_hash,
+            'metadata_hash': content_hash(json.dumps(metadata, sort_keys=True))
+        })
+
+    return chunks
+
+
+def source_path(path: Path, root: Path) -> str:
+    """Source recorded in chunk metadata (e.g. docs/module-1/week-1.md)"""
+    return path.relative_to(root.parent).as_posix()
+
+
+def read_document(path: Path, root: Path) -> Dict:
+    """Content (without frontmatter) and metadata of one file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    return {
+        'content': remove_frontmatter(content),
+        'metadata': {
+            **extract_metadata(content),
+            'source': source_path(path, root),
+            'filename': path.name,
+            'module': extract_module(path),
+            'chapter': extract_chapter(path, root)
+        }
+    }
+
+
+_worker_chunker: Optional[MarkdownChunker] = None
+
+
+def parse_file(path: str, root: str) -> Dict[str, Any]:
+    """Read and chunk one file (process pool task); errors are returned, not raised"""
+    source = source_path(Path(path), Path(root))
+    global _worker_chunker
+    if _worker_chunker is None:
+        _worker_chunker = MarkdownChunker()
+
+    try:
+        document = read_document(Path(path), Path(root))
+        return {'path': path, 'source': source, 'chunks': document_chunks(document, _worker_chunker)}
+    except Exception as e:
+        return {'path': path, 'source': source, 'chunks': [], 'error': str(e)}
+
+
+# ============================================================================
+# Streaming
+# ============================================================================
+
+def parse_files(
+    files: Iterable[Tuple[Path, Path]],
+    workers: int = INDEX_WORKERS,
+    window: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parse files in a process pool, yielding results in discovery order
+
+    At most `window` files (default 2 per worker) are parsed or waiting to
+    be consumed at any time, so a slow consumer throttles the parsers.
+    """
+    window = window or workers * 2
+    if workers <= 1:
+        for path, root in files:
+            yield parse_file(str(path), str(root))
+        return
+
+    # Spawned workers don't inherit the parent's threads or open clients
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending: Deque[Future] = deque()
+        try:
+            for path, root in files:
+                pending.append(pool.submit(parse_file, str(path), str(root)))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
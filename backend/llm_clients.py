@@ -0,0 +1,127 @@
+"""
+Application-scoped HTTP and OpenAI clients.
+One pooled httpx client (sync and async) is shared by the API endpoints and
+RAGSystem, so requests reuse kept-alive connections instead of building a
+client and repeating the TLS handshake per call.
+"""
+
+import os
+import threading
+from typing import Optional
+
+import httpx
+
+# Connection pool and timeout tuning
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+# HTTP/2 multiplexes concurrent calls over one connection (needs the h2 package)
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_openai_client = None
+_async_openai_client = None
+
+
+def timeout() -> httpx.Timeout:
+    """Request timeout (read/write/pool) with a shorter connect timeout"""
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+
+def _http2_enabled() -> bool:
+    if not OPENAI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("Warning: OPENAI_HTTP2 is set but the h2 package is missing; using HTTP/1.1")
+        return False
+    return True
+
+
+def http_client() -> httpx.Client:
+    """Shared pooled sync HTTP client"""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=_limits(),
+                    timeout=timeout(),
+                    http2=_http2_enabled()
+                )
+    return _http_client
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """Shared pooled async HTTP client"""
+    global _async_http_client
+    if _async_http_client is None:
+        with _lock:
+            if _async_http_client is None:
+                _async_http_client = httpx.AsyncClient(
+                    limits=_limits(),
+                    timeout=timeout(),
+                    http2=_http2_enabled()
+                )
+    return _async_http_client
+
+
+def openai_client():
+    """Shared sync OpenAI client on the pooled HTTP client"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+
+        client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client(),
+            timeout=timeout()
+        )
+        with _lock:
+            if _openai_client is None:
+                _openai_client = client
+    return _openai_client
+
+
+def async_openai_client():
+    """Shared async OpenAI client on the pooled HTTP client (FastAPI dependency)"""
+    global _async_openai_client
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=async_http_client(),
+            timeout=timeout()
+        )
+        with _lock:
+            if _async_openai_client is None:
+                _async_openai_client = client
+    return _async_openai_client
+
+
+async def aclose():
+    """Close the pooled connections (application shutdown)"""
+    global _http_client, _async_http_client, _openai_client, _async_openai_client
+    with _lock:
+        sync_client, async_client = _http_client, _async_http_client
+        _http_client = _async_http_client = None
+        _openai_client = _async_openai_client = None
+    if async_client is not None:
+        await async_client.aclose()
+    if sync_client is not None:
+        sync_client.close()
@@ -0,0 +1,185 @@
+"""
+In-process vector search over a memory-mapped NumPy matrix.
+An alternative to Qdrant for small deployments and tests: the whole book is
+a few thousand chunks, so a brute-force dot product beats a network round trip.
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_LOCAL_STORE_PATH = Path(__file__).parent / ".local_vectors"
+
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.json"
+# Names the version subdirectory holding the current vectors and payloads
+CURRENT_FILE = "CURRENT"
+
+
+class LocalVectorStore:
+    """
+    Contiguous matrix of L2-normalized vectors plus a payload side-table
+
+    Row i of vectors.npy belongs to ids[i] / payloads[i] in payloads.json.
+    Vectors are normalized on write, so cosine similarity is a dot product.
+    Each write goes to a new version subdirectory that CURRENT then points to.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        payloads: List[Dict[str, Any]],
+        embedding: Optional[Dict[str, Any]] = None
+    ):
+        self.ids = ids
+        self.vectors = vectors
+        self.payloads = payloads
+        self.embedding = embedding or {}
+        self._rows = {point_id: row for row, point_id in enumerate(ids)}
+        self._filter_index: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, directory: Optional[Path] = None, mmap: bool = True) -> "LocalVectorStore":
+        """
+        Open a store written by write(); float32 vectors stay memory-mapped by default
+
+        float16 is only an on-disk format: NumPy has no BLAS path for half
+        precision, so those vectors are upcast to float32 once here.
+        """
+        directory = _version_directory(Path(directory) if directory else DEFAULT_LOCAL_STORE_PATH)
+        vectors = np.load(directory / VECTORS_FILE, mmap_mode='r' if mmap else None)
+        if vectors.dtype != np.float32:
+            vectors = vectors.astype(np.float32)
+        with open(directory / PAYLOADS_FILE, 'r', encoding='utf-8') as f:
+            side_table = json.load(f)
+        if vectors.shape[0] != len(side_table['ids']):
+            raise ValueError(f"{vectors.shape[0]} vectors but {len(side_table['ids'])} payloads in {directory}")
+        return cls(side_table['ids'], vectors, side_table['payloads'], side_table.get('embedding'))
+
+    @staticmethod
+    def write(
+        directory: Path,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        payloads: Sequence[Dict[str, Any]],
+        dtype: str = "float32",
+        embedding: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Atomically replace the store in directory
+
+        Both files go into a new version subdirectory, and one os.replace of
+        CURRENT switches readers over. The previous version is kept for
+        readers that are still opening it; older ones are deleted.
+
+        Args:
+            embedding: Model/dimensions the vectors were made with
+        """
+        directory = Path(directory)
+        previous = _version_directory(directory)
+        version = f"v{time.time_ns()}"
+        target = directory / version
+        target.mkdir(parents=True)
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+        with open(target / VECTORS_FILE, 'wb') as f:
+            np.save(f, np.ascontiguousarray(matrix.astype(dtype)))
+        with open(target / PAYLOADS_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ids': list(ids),
+                'payloads': list(payloads),
+                'embedding': embedding or {}
+            }, f, ensure_ascii=False)
+
+        current_tmp = directory / (CURRENT_FILE + ".tmp")
+        current_tmp.write_text(version, encoding='utf-8')
+        os.replace(current_tmp, directory / CURRENT_FILE)
+
+        for stale in directory.glob("v*"):
+            if stale.is_dir() and stale not in (target, previous):
+                shutil.rmtree(stale, ignore_errors=True)
+        if previous == directory:
+            # Files of a store written before versioned directories
+            for name in (VECTORS_FILE, PAYLOADS_FILE):
+                (directory / name).unlink(missing_ok=True)
+
+    def vector(self, point_id: str) -> Optional[np.ndarray]:
+        """Stored (normalized) vector for an ID"""
+        row = self._rows.get(point_id)
+        return np.asarray(self.vectors[row], dtype=np.float32) if row is not None else None
+
+    def _rows_matching(self, field: str, values: Sequence[Any]) -> np.ndarray:
+        """Row indices whose metadata[field] is one of values (index built lazily)"""
+        index = self._filter_index.get(field)
+        if index is None:
+            groups: Dict[Any, List[int]] = {}
+            for row, payload in enumerate(self.payloads):
+                value = (payload.get('metadata') or {}).get(field)
+                groups.setdefault(value, []).append(row)
+            index = {value: np.asarray(rows, dtype=np.int64) for value, rows in groups.items()}
+            self._filter_index[field] = index
+        parts = [index[value] for value in values if value in index]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def search(
+        self,
+        vector: Sequence[float],
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Top-k (id, cosine score, payload) for a query vector
+
+        Args:
+            filters: Optional {metadata_field: value or [values]}; all fields must match
+        """
+        if not self.ids or k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        rows: Optional[np.ndarray] = None
+        for field, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            matching = self._rows_matching(field, list(values))
+            rows = matching if rows is None else np.intersect1d(rows, matching)
+
+        if rows is None:
+            scores = self.vectors @ query
+        elif rows.size == 0:
+            return []
+        else:
+            scores = self.vectors[rows] @ query
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for position in top:
+            row = int(rows[position]) if rows is not None else int(position)
+            results.append((self.ids[row], float(scores[position]), self.payloads[row]))
+        return results
+
+
+def _version_directory(directory: Path) -> Path:
+    """Directory holding the current files (the store directory itself for older stores)"""
+    try:
+        return directory / (directory / CURRENT_FILE).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return directory
@@ -3,24 +3,118 @@ FastAPI Backend for Physical AI & Robotics Textbook Platform
 Handles authentication, RAG chatbot, personalization, and translation
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from sqlalchemy.orm import Session
+import asyncio
+import base64
+import hmac
+import importlib
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+from database import (
+    AsyncSessionLocal,
+    HISTORY_PAGE_MAX,
+    SessionLocal,
+    dispose_async_engine,
+    get_db,
+    get_message_page,
+    init_db,
+    content_hash,
+    get_cached_translation,
+    store_translation,
+    get_cached_personalization,
+    store_personalization,
+)
+from singleflight import SingleFlight, request_key
+from message_log import conversation_owner, message_log, new_conversation_id, owns_conversation
+from indexing_job import indexing_job
+from admission import AdmissionRejected, address_budgets, client_address, client_key, llm_slots, user_budgets
+import llm_clients
+from llm_clients import async_openai_client
+from metrics import (
+    MetricsMiddleware,
+    estimate_cost,
+    llm_call,
+    record_cache_lookup,
+    record_coalesced,
+    record_llm_usage,
+    record_rejection,
+    render as render_metrics,
+    track_queue_depth,
+)
+
+# Build and warm the RAG system at startup instead of on the first chat request
+WARM_START = os.getenv("WARM_START", "true").lower() in ("1", "true", "yes")
+
+# Bearer token allowed to start indexing jobs over the API (unset disables them)
+INDEX_ADMIN_TOKEN = os.getenv("INDEX_ADMIN_TOKEN", "")
+
+# Cold-start report: filled in by warm_rag_system(), served by /ready
+startup_state: Dict[str, Any] = {"status": "starting" if WARM_START else "lazy", "timings_ms": {}}
+
+async def warm_rag_system():
+    """Import, build and warm up the RAG system off the request path"""
+    timings = startup_state["timings_ms"]
+    try:
+        start = time.perf_counter()
+        rag_module = await run_in_threadpool(importlib.import_module, "rag")
+        timings["import"] = round((time.perf_counter() - start) * 1000, 2)
+        
+        start = time.perf_counter()
+        rag = await rag_module.aget_rag_system()
+        timings["init"] = round((time.perf_counter() - start) * 1000, 2)
+        
+        if rag.ready:
+            timings.update(await rag.awarm_up())
+        
+        startup_state["status"] = "ready" if rag.ready else "degraded"
+        print(f"🔥 RAG system {startup_state['status']}: " +
+              ", ".join(f"{stage} {ms:.0f}ms" for stage, ms in timings.items()))
+    except Exception as e:
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        print(f"Warning: RAG warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    try:
+        await run_in_threadpool(init_db)
+    except Exception as e:
+        print(f"Warning: database initialization failed: {e}")
+    
+    # Warm up in the background so the server accepts requests (and health checks) right away
+    warmup = asyncio.create_task(warm_rag_system()) if WARM_START else None
+    message_log.start()
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    # Progress is checkpointed, so the next job resumes where this one stops
+    await indexing_job.stop()
+    await message_log.stop()
+    await dispose_async_engine()
+    await llm_clients.aclose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Physical AI Robotics Platform API",
     description="Backend API for AI-native textbook with RAG chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -36,8 +130,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request latency for /metrics (outermost, so it times everything)
+app.add_middleware(MetricsMiddleware)
+
+# ============================================================================
+# Admission Control
+# ============================================================================
+
+track_queue_depth(llm_slots.queued)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Answer rejected requests with 429 and a Retry-After hint"""
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    record_rejection(route, exc.kind)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.detail, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+async def admit_llm_request(request: Request):
+    """
+    Dependency for LLM-backed endpoints: spend one unit of the caller's
+    budget (keyed on the bearer token, else the client address) and of its
+    address's budget
+    
+    Tokens aren't verified, so the address budget is what bounds a client
+    that sends a fresh token with every request. LLM capacity is only
+    checked once a request misses its cache, so cached answers are served
+    even while the LLM queue is full.
+    """
+    forwarded_for = request.headers.get("x-forwarded-for")
+    host = request.client.host if request.client else None
+    address_budgets.check("ip:" + client_address(forwarded_for, host))
+    user_budgets.check(client_key(request.headers.get("authorization"), forwarded_for, host))
+
+def sse_rejection(exc: AdmissionRejected) -> str:
+    """Error event for a stream that timed out waiting for an LLM slot"""
+    return sse_event("error", {"detail": exc.detail, "retry_after": exc.retry_after})
+
 # Security
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+async def require_index_admin(token: str = Depends(oauth2_scheme)):
+    """Dependency for indexing and cache admin endpoints: the bearer token must be INDEX_ADMIN_TOKEN"""
+    if not INDEX_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (INDEX_ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest(token.encode('utf-8'), INDEX_ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Not allowed")
 
 # ============================================================================
 # Pydantic Models
@@ -62,7 +204,14 @@ class ChatQuery(BaseModel):
     query: str
     context: Optional[str] = None  # Selected text from the page
     chapter: Optional[str] = None
-    conversation_id: Optional[str] = None
+    conversation_id: Optional[str] = None  # As returned by an earlier answer
+
+def chat_conversation_id(query: ChatQuery, token: Optional[str]) -> str:
+    """The query's conversation if the caller started it, else a new one"""
+    owner = conversation_owner(token)
+    if query.conversation_id and owns_conversation(query.conversation_id, owner):
+        return query.conversation_id
+    return new_conversation_id(owner)
 
 class PersonalizeRequest(BaseModel):
     """Content personalization request"""
@@ -74,12 +223,30 @@ class TranslationRequest(BaseModel):
     """Translation request"""
     content: str
     target_language: str = "ur"  # Urdu
+    chapter: Optional[str] = None  # Scopes the translation cache
 
 class Token(BaseModel):
     """JWT token response"""
     access_token: str
     token_type: str
 
+# ============================================================================
+# Server-Sent Events
+# ============================================================================
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Stop proxies from buffering the stream
+}
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an event generator in a text/event-stream response"""
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ============================================================================
 # Health Check
 # ============================================================================
@@ -104,6 +271,22 @@ async def health_check():
         "database_configured": bool(os.getenv("DATABASE_URL"))
     }
 
+@app.get("/ready")
+async def readiness(response: Response):
+    """
+    Readiness probe: 503 until the RAG system is built and warmed up
+    Reports the cold-start timings (import, init, embed, search)
+    """
+    if startup_state["status"] not in ("ready", "lazy"):
+        response.status_code = 503
+    return startup_state
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: route and RAG stage latency, LLM tokens/cost, caches"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/favicon.ico")
 async def favicon():
     """Return empty response for favicon requests to prevent 404 errors"""
@@ -189,118 +372,372 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 # RAG Chatbot Endpoints
 # ============================================================================
 
-@app.post("/api/chat/query")
-async def chat_query(query: ChatQuery):
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format pipeline stage timings as a Server-Timing header value"""
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in timings.items())
+
+# Identical questions asked at the same time share one RAG query
+chat_flights = SingleFlight()
+
+def chat_flight_key(query: ChatQuery) -> str:
+    """Question (case and whitespace normalized), selected text and chapter"""
+    question = " ".join(query.query.split()).lower()
+    return request_key(question, query.context, query.chapter)
+
+@app.post("/api/chat/query", dependencies=[Depends(admit_llm_request)])
+async def chat_query(query: ChatQuery, response: Response, token: Optional[str] = Depends(optional_oauth2_scheme)):
     """
     RAG-powered chatbot query endpoint
     Supports both general questions and context-specific queries
+    Per-stage timings (embed, cache, search, generate) are reported in the
+    Server-Timing response header
     """
     try:
-        from rag import get_rag_system
-        rag = get_rag_system()
+        from rag import aget_rag_system
+        rag = await aget_rag_system()
         
-        # Query RAG system
-        result = rag.query(
-            question=query.query,
-            context=query.context,
-            k=3  # Retrieve 3 most relevant chunks
-        )
+        async def ask() -> Dict[str, Any]:
+            # Query RAG system without blocking the event loop (it takes an
+            # LLM slot only around the completion call)
+            return await rag.aquery(
+                question=query.query,
+                context=query.context,
+                k=3,  # Retrieve 3 most relevant chunks
+                chapter=query.chapter
+            )
+        
+        result, shared = await chat_flights.do(chat_flight_key(query), ask)
+        if shared:
+            record_coalesced("chat")
         
+        # Persisted in the background by the write-behind log
+        conversation_id = chat_conversation_id(query, token)
+        message_log.log_turn(conversation_id, query.query, result['answer'], query.context, query.chapter)
+        
+        response.headers["Server-Timing"] = server_timing(result['timings'])
         return {
             "response": result['answer'],
             "sources": result['sources'],
-            "conversation_id": query.conversation_id or "new_conversation"
+            "conversation_id": conversation_id,
+            "cached": result['cached']
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()  # Print full stack trace to terminal
         raise HTTPException(status_code=500, detail=f"RAG query failed: {str(e)}")
 
+@app.post("/api/chat/query/stream", dependencies=[Depends(admit_llm_request)])
+async def chat_query_stream(query: ChatQuery, token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """
+    Streaming variant of /api/chat/query
+    Emits a `sources` event right after retrieval, then `token` events as
+    the answer is generated, then `done`
+    The answer cache and LLM capacity are checked before the response
+    starts, so a saturated server still answers a cache miss with 429
+    """
+    from rag import aget_rag_system
+    
+    conversation_id = chat_conversation_id(query, token)
+    try:
+        rag = await aget_rag_system()
+        stream = rag.astream_query(
+            question=query.query,
+            context=query.context,
+            k=3,
+            chapter=query.chapter
+        )
+        # Runs the cache lookup and capacity check (and retrieval, on a miss)
+        first = await stream.__anext__()
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"RAG query failed: {str(e)}")
+    
+    async def remaining() -> AsyncIterator[Tuple[str, Any]]:
+        yield first
+        async for event in stream:
+            yield event
+    
+    async def events():
+        try:
+            parts = []
+            async for event, data in remaining():
+                if event == "token":
+                    parts.append(data)
+                elif event == "done":
+                    message_log.log_turn(conversation_id, query.query, "".join(parts), query.context, query.chapter)
+                    data = {**data, "conversation_id": conversation_id}
+                yield sse_event(event, data)
+        except AdmissionRejected as e:
+            yield sse_rejection(e)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield sse_event("error", {"detail": f"RAG query failed: {str(e)}"})
+    
+    return sse_response(events())
+
+@app.delete("/api/chat/cache", dependencies=[Depends(require_index_admin)])
+async def clear_answer_cache():
+    """
+    Invalidate the semantic answer cache (e.g. after re-indexing the book)
+    """
+    from rag import aget_rag_system
+    rag = await aget_rag_system()
+    rag.answer_cache.invalidate()
+    
+    return {
+        "status": "success",
+        "message": "Answer cache cleared"
+    }
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    """Opaque history cursor for a message's (created_at, id) position"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{message_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Position from a history cursor (400 if malformed)"""
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/chat/history")
 async def get_chat_history(
     conversation_id: str = Query(...),
+    limit: int = Query(50, ge=1, le=HISTORY_PAGE_MAX),
+    before: Optional[str] = Query(None, description="Cursor: page of messages before this one"),
+    since: Optional[str] = Query(None, description="Cursor: messages after this one (polling)"),
     token: str = Depends(oauth2_scheme)
 ):
     """
-    Retrieve chat history for a conversation
+    Retrieve chat history for a conversation, oldest message first
+    Without cursors, returns the latest `limit` messages. `next_cursor` pages
+    further back (pass it as `before`); `latest_cursor` (on the first page and
+    when polling) fetches newer messages (pass it as `since`). Turns are
+    logged write-behind, so the newest one may take a couple of seconds to
+    appear.
     """
-    # TODO: Implement chat history retrieval from database
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either before or since, not both")
+    if not owns_conversation(conversation_id, conversation_owner(token)):
+        raise HTTPException(status_code=403, detail="Not your conversation")
+    
+    # One extra row tells whether another page exists
+    async with AsyncSessionLocal() as session:
+        rows = await get_message_page(
+            session, conversation_id, limit + 1,
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(since) if since else None
+        )
+    
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit] if since else rows[1:]
+    
+    messages = [
+        {
+            "id": row.id,
+            "role": row.role,
+            "content": row.content,
+            "context": row.context,
+            "chapter": row.chapter,
+            "created_at": row.created_at.isoformat()
+        }
+        for row in rows
+    ]
+    
+    latest_cursor = None
+    if not before:
+        latest_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if rows else since
     return {
         "conversation_id": conversation_id,
-        "messages": []
+        "messages": messages,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(rows[0].created_at, rows[0].id) if rows and has_more and not since else None,
+        "latest_cursor": latest_cursor
     }
 
 # ============================================================================
 # Personalization Endpoints
 # ============================================================================
 
-@app.post("/api/personalize")
-async def personalize_content(request: PersonalizeRequest):
+# Define prompts for each level
+LEVEL_PROMPTS = {
+    "beginner": "Rewrite this robotics content for absolute beginners. Use simple language, add detailed explanations, include analogies, break down complex concepts step-by-step. Assume no prior robotics knowledge.",
+    "intermediate": "Rewrite this robotics content for intermediate learners. Focus on practical examples, real-world applications, and hands-on implementation. Assume basic programming and robotics knowledge.",
+    "advanced": "Rewrite this robotics content for advanced practitioners. Focus on optimization, advanced techniques, best practices, and production considerations. Be concise and technical."
+}
+
+# Concurrent cache misses for the same (chapter, level, content) share one LLM call
+personalization_flights = SingleFlight()
+
+def personalization_level(request: PersonalizeRequest) -> str:
+    """Level whose prompt is used (unknown levels fall back to intermediate)"""
+    return request.user_level if request.user_level in LEVEL_PROMPTS else "intermediate"
+
+def personalization_messages(request: PersonalizeRequest) -> List[Dict[str, str]]:
+    """Chat messages asking the model to rewrite content for a level"""
+    prompt = LEVEL_PROMPTS[personalization_level(request)]
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": f"Content to adapt:\n\n{request.content}"}
+    ]
+
+async def lookup_personalization(request: PersonalizeRequest, key_hash: str) -> Optional[str]:
+    """Cached rewrite for a request, or None (cache errors are non-fatal)"""
+    def lookup():
+        with SessionLocal() as db:
+            entry = get_cached_personalization(db, request.chapter, personalization_level(request), key_hash)
+            return entry.personalized_content if entry else None
+    
+    try:
+        cached = await run_in_threadpool(lookup)
+        record_cache_lookup("personalization", cached is not None)
+        return cached
+    except Exception as e:
+        print(f"Warning: personalization cache lookup failed: {e}")
+        return None
+
+async def remember_personalization(request: PersonalizeRequest, key_hash: str, personalized: str):
+    """Store a rewrite in the cache (cache errors are non-fatal)"""
+    def store():
+        with SessionLocal() as db:
+            store_personalization(db, request.chapter, personalization_level(request), key_hash, personalized)
+    
+    try:
+        await run_in_threadpool(store)
+    except Exception as e:
+        print(f"Warning: personalization cache write failed: {e}")
+
+@app.post("/api/personalize", dependencies=[Depends(admit_llm_request)])
+async def personalize_content(request: PersonalizeRequest, client: Any = Depends(async_openai_client)):
     """
     Personalize chapter content based on user level using GPT-4
+    Rewrites are cached per (chapter, level, content), shared by all users
     """
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        key_hash = content_hash(request.content)
         
-        # Define prompts for each level
-        level_prompts = {
-            "beginner": "Rewrite this robotics content for absolute beginners. Use simple language, add detailed explanations, include analogies, break down complex concepts step-by-step. Assume no prior robotics knowledge.",
-            "intermediate": "Rewrite this robotics content for intermediate learners. Focus on practical examples, real-world applications, and hands-on implementation. Assume basic programming and robotics knowledge.",
-            "advanced": "Rewrite this robotics content for advanced practitioners. Focus on optimization, advanced techniques, best practices, and production considerations. Be concise and technical."
-        }
-        
-        prompt = level_prompts.get(request.user_level, level_prompts["intermediate"])
-        
-        # Use GPT-3.5-turbo to personalize (cheaper than GPT-4)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": f"Content to adapt:\n\n{request.content}"}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
-        
-        personalized_content = response.choices[0].message.content
+        cached = await lookup_personalization(request, key_hash)
+        if cached is None:
+            llm_slots.check()
+            
+            async def generate() -> Optional[str]:
+                # Use GPT-3.5-turbo to personalize (cheaper than GPT-4)
+                async with llm_slots.slot():
+                    with llm_call("personalize"):
+                        response = await client.chat.completions.create(
+                            model="gpt-3.5-turbo",
+                            messages=personalization_messages(request),
+                            temperature=0.7,
+                            max_tokens=1500
+                        )
+                if response.usage:
+                    record_llm_usage(
+                        "personalize", "gpt-3.5-turbo",
+                        response.usage.prompt_tokens, response.usage.completion_tokens
+                    )
+                
+                content = response.choices[0].message.content
+                if content:
+                    await remember_personalization(request, key_hash, content)
+                return content
+            
+            flight_key = (request.chapter, personalization_level(request), key_hash)
+            personalized_content, shared = await personalization_flights.do(flight_key, generate)
+            if shared:
+                record_coalesced("personalize")
+        else:
+            personalized_content = cached
         
         return {
             "original_content": request.content,
             "personalized_content": personalized_content,
             "user_level": request.user_level,
-            "chapter": request.chapter
+            "chapter": request.chapter,
+            "cached": cached is not None
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Personalization failed: {str(e)}")
 
+@app.post("/api/personalize/stream", dependencies=[Depends(admit_llm_request)])
+async def personalize_content_stream(request: PersonalizeRequest, client: Any = Depends(async_openai_client)):
+    """
+    Streaming variant of /api/personalize
+    Emits `token` events as the rewrite is generated, then `done`
+    A cached rewrite is sent as a single `token` event
+    """
+    key_hash = content_hash(request.content)
+    
+    # Looked up before the response starts, so a miss can still be answered with 429
+    cached = await lookup_personalization(request, key_hash)
+    if cached is None:
+        llm_slots.check()
+    
+    async def events():
+        if cached is not None:
+            yield sse_event("token", cached)
+            yield sse_event("done", {
+                "user_level": request.user_level,
+                "chapter": request.chapter,
+                "cached": True
+            })
+            return
+        
+        try:
+            parts = []
+            async with llm_slots.slot():
+                with llm_call("personalize"):
+                    stream = await client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=personalization_messages(request),
+                        temperature=0.7,
+                        max_tokens=1500,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    async for chunk in stream:
+                        if chunk.usage:
+                            record_llm_usage(
+                                "personalize", "gpt-3.5-turbo",
+                                chunk.usage.prompt_tokens, chunk.usage.completion_tokens
+                            )
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield sse_event("token", chunk.choices[0].delta.content)
+            
+            if parts:
+                await remember_personalization(request, key_hash, "".join(parts))
+            
+            yield sse_event("done", {
+                "user_level": request.user_level,
+                "chapter": request.chapter,
+                "cached": False
+            })
+        except AdmissionRejected as e:
+            yield sse_rejection(e)
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Personalization failed: {str(e)}"})
+    
+    return sse_response(events())
+
 # ============================================================================
 # Translation Endpoints
 # ============================================================================
 
-@app.post("/api/translate")
-async def translate_content(request: TranslationRequest):
-    """
-    Translate content to Urdu using GPT-3.5-turbo (optimized for cost)
-    """
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        # Optimize token usage: Limit to 3000 chars (~750 tokens input)
-        # This keeps cost per translation under $0.002 (input + output)
-        MAX_CHARS = 3000
-        content_to_translate = request.content[:MAX_CHARS] if len(request.content) > MAX_CHARS else request.content
-        
-        # Estimate tokens (rough: 4 chars = 1 token)
-        estimated_input_tokens = len(content_to_translate) // 4
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a professional Urdu translator for educational robotics content. 
+# Optimize token usage: Limit to 3000 chars (~750 tokens input)
+# This keeps cost per translation under $0.002 (input + output)
+MAX_TRANSLATION_CHARS = 3000
+
+TRANSLATION_SYSTEM_PROMPT = """You are a professional Urdu translator for educational robotics content. 
 
 TRANSLATION RULES:
 1. Translate educational explanations naturally to Pakistani Urdu
@@ -325,28 +762,116 @@ EXAMPLES:
 "- First point\\n- Second point" → "- پہلا نکتہ\\n- دوسرا نکتہ"
 
 Translate ONLY the educational content. Keep structure and formatting intact."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Translate this robotics chapter to Urdu:\n\n{content_to_translate}"
-                }
-            ],
-            temperature=0.3,
-            max_tokens=2000  # Increased slightly for better quality
+
+def translation_messages(content: str) -> List[Dict[str, str]]:
+    """Chat messages asking the model to translate content to Urdu"""
+    return [
+        {
+            "role": "system",
+            "content": TRANSLATION_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Translate this robotics chapter to Urdu:\n\n{content}"
+        }
+    ]
+
+def estimate_translation_cost(usage: Any) -> float:
+    """USD cost of a gpt-3.5-turbo call from its token usage"""
+    return estimate_cost("gpt-3.5-turbo", usage.prompt_tokens, usage.completion_tokens)
+
+async def lookup_translation(db: Session, request: TranslationRequest, key_hash: str) -> Optional[str]:
+    """Cached translation for a request, or None (cache errors are non-fatal)"""
+    def lookup():
+        entry = get_cached_translation(db, request.chapter, request.target_language, key_hash)
+        cached = entry.translated_content if entry else None
+        # End the read transaction so the connection goes back to the small
+        # sync pool instead of being held through the LLM call
+        db.rollback()
+        return cached
+    
+    try:
+        cached = await run_in_threadpool(lookup)
+        record_cache_lookup("translation", cached is not None)
+        return cached
+    except Exception as e:
+        print(f"Warning: translation cache lookup failed: {e}")
+        return None
+
+async def remember_translation(db: Session, request: TranslationRequest, key_hash: str, translated: str):
+    """Store a translation in the cache (cache errors are non-fatal)"""
+    try:
+        await run_in_threadpool(
+            store_translation, db, request.chapter, request.target_language, key_hash, translated
         )
+    except Exception as e:
+        print(f"Warning: translation cache write failed: {e}")
+
+# 40 students clicking "Translate" on a shared chapter link make one LLM call
+translation_flights = SingleFlight()
+
+@app.post("/api/translate", dependencies=[Depends(admit_llm_request)])
+async def translate_content(
+    request: TranslationRequest,
+    db: Session = Depends(get_db),
+    client: Any = Depends(async_openai_client)
+):
+    """
+    Translate content to Urdu using GPT-3.5-turbo (optimized for cost)
+    Repeat translations of the same content are served from the database cache
+    """
+    try:
+        content_to_translate = request.content[:MAX_TRANSLATION_CHARS]
+        key_hash = content_hash(content_to_translate)
         
-        translated_content = response.choices[0].message.content
+        cached = await lookup_translation(db, request, key_hash)
+        if cached is not None:
+            return {
+                "original_content": request.content,
+                "translated_content": cached,
+                "target_language": request.target_language,
+                "characters_translated": len(content_to_translate),
+                "tokens_used": 0,
+                "estimated_cost_usd": 0.0,
+                "truncated": len(request.content) > MAX_TRANSLATION_CHARS,
+                "cached": True
+            }
         
-        # Validate translation was successful
-        if not translated_content or len(translated_content) < 50:
-            raise ValueError("Translation produced insufficient content")
+        llm_slots.check()
         
-        # Preserve line breaks and formatting
-        translated_content = translated_content.strip()
+        async def generate() -> Tuple[str, int, float]:
+            async with llm_slots.slot():
+                with llm_call("translate"):
+                    response = await client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=translation_messages(content_to_translate),
+                        temperature=0.3,
+                        max_tokens=2000  # Increased slightly for better quality
+                    )
+            
+            translated_content = response.choices[0].message.content
+            
+            # Validate translation was successful
+            if not translated_content or len(translated_content) < 50:
+                raise ValueError("Translation produced insufficient content")
+            
+            # Preserve line breaks and formatting
+            translated_content = translated_content.strip()
+            
+            # Calculate actual token usage and cost
+            estimated_cost = record_llm_usage(
+                "translate", "gpt-3.5-turbo", response.usage.prompt_tokens, response.usage.completion_tokens
+            )
+            
+            await remember_translation(db, request, key_hash, translated_content)
+            return translated_content, response.usage.total_tokens, estimated_cost
         
-        # Calculate actual token usage and cost
-        tokens_used = response.usage.total_tokens
-        estimated_cost = (response.usage.prompt_tokens * 0.0000015) + (response.usage.completion_tokens * 0.000002)
+        # Concurrent identical requests await one call; only its caller is billed for it
+        flight_key = (request.chapter, request.target_language, key_hash)
+        (translated_content, tokens_used, estimated_cost), shared = await translation_flights.do(flight_key, generate)
+        if shared:
+            record_coalesced("translate")
+            tokens_used, estimated_cost = 0, 0.0
         
         return {
             "original_content": request.content,
@@ -355,40 +880,147 @@ Translate ONLY the educational content. Keep structure and formatting intact."""
             "characters_translated": len(content_to_translate),
             "tokens_used": tokens_used,
             "estimated_cost_usd": round(estimated_cost, 6),
-            "truncated": len(request.content) > MAX_CHARS
+            "truncated": len(request.content) > MAX_TRANSLATION_CHARS,
+            "cached": False
         }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
+@app.post("/api/translate/stream", dependencies=[Depends(admit_llm_request)])
+async def translate_content_stream(request: TranslationRequest, client: Any = Depends(async_openai_client)):
+    """
+    Streaming variant of /api/translate
+    Emits `token` events as the translation is generated, then `done` with usage
+    A cached translation is sent as a single `token` event
+    """
+    content_to_translate = request.content[:MAX_TRANSLATION_CHARS]
+    key_hash = content_hash(content_to_translate)
+    
+    # Looked up before the response starts, so a miss can still be answered with 429
+    with SessionLocal() as db:
+        cached = await lookup_translation(db, request, key_hash)
+    if cached is None:
+        llm_slots.check()
+    
+    async def events():
+        # The session must outlive the handler, so the generator owns it
+        with SessionLocal() as db:
+            async for event in translation_events(db):
+                yield event
+    
+    async def translation_events(db: Session):
+        if cached is not None:
+            yield sse_event("token", cached)
+            yield sse_event("done", {
+                "target_language": request.target_language,
+                "characters_translated": len(content_to_translate),
+                "tokens_used": 0,
+                "estimated_cost_usd": 0.0,
+                "truncated": len(request.content) > MAX_TRANSLATION_CHARS,
+                "cached": True
+            })
+            return
+        
+        try:
+            usage = None
+            parts = []
+            async with llm_slots.slot():
+                with llm_call("translate"):
+                    stream = await client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=translation_messages(content_to_translate),
+                        temperature=0.3,
+                        max_tokens=2000,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield sse_event("token", chunk.choices[0].delta.content)
+            if usage:
+                record_llm_usage("translate", "gpt-3.5-turbo", usage.prompt_tokens, usage.completion_tokens)
+            
+            translated_content = "".join(parts).strip()
+            if len(translated_content) >= 50:
+                await remember_translation(db, request, key_hash, translated_content)
+            
+            yield sse_event("done", {
+                "target_language": request.target_language,
+                "characters_translated": len(content_to_translate),
+                "tokens_used": usage.total_tokens if usage else None,
+                "estimated_cost_usd": round(estimate_translation_cost(usage), 6) if usage else None,
+                "truncated": len(request.content) > MAX_TRANSLATION_CHARS,
+                "cached": False
+            })
+        except AdmissionRejected as e:
+            yield sse_rejection(e)
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Translation failed: {str(e)}"})
+    
+    return sse_response(events())
+
 # ============================================================================
 # Vector Database Management
 # ============================================================================
 
-@app.post("/api/embeddings/index")
-async def index_book_content():
+async def reload_rag_index():
+    """Point a running RAG system at the freshly built index"""
+    from rag import aget_rag_system
+    rag = await aget_rag_system()
+    await run_in_threadpool(rag.reload_index)
+    if rag.ready and startup_state["status"] == "degraded":
+        startup_state["status"] = "ready"
+
+@app.post("/api/embeddings/index", status_code=202, dependencies=[Depends(require_index_admin)])
+async def index_book_content(
+    full: bool = Query(False, description="Rebuild into a new collection, re-embedding every chunk")
+):
     """
-    Index all book content into Qdrant vector database
-    This should be run after book content is generated
+    Start (or resume) indexing the book content in the background
+    Requires INDEX_ADMIN_TOKEN as the bearer token. Only new or changed
+    chunks are embedded unless `full` is set; a full rebuild fills a new
+    collection and swaps it in when done, so chat keeps serving the old
+    index meanwhile. Poll /api/embeddings/status for progress. When the
+    job finishes, the RAG system reloads its indexes and drops cached answers.
     """
-    # TODO: Implement book content indexing
+    try:
+        job = indexing_job.start(full=full, on_complete=reload_rag_index)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     return {
-        "status": "success",
-        "message": "Book content indexed successfully",
-        "documents_indexed": 0
+        "status": "accepted",
+        "message": "Indexing started",
+        "job": job
     }
 
 @app.get("/api/embeddings/status")
 async def get_embedding_status():
     """
-    Check the status of vector database
+    Check the status of the vector database and of the last indexing job
     """
-    # TODO: Implement Qdrant status check
+    index: Dict[str, Any] = {"status": "not_loaded"}
+    if startup_state["status"] != "starting":
+        try:
+            from rag import aget_rag_system
+            rag = await aget_rag_system()
+            index = await run_in_threadpool(rag.get_collection_stats)
+        except Exception as e:
+            index = {"status": "error", "error": str(e)}
     
     return {
-        "status": "ready",
-        "total_documents": 0,
-        "collections": []
+        "status": index.get("status", "error"),
+        "total_documents": index.get("total_documents", 0),
+        "collections": [index["collection_name"]] if "collection_name" in index else [],
+        "index": index,
+        "indexing_job": indexing_job.status(),
+        # Set when the last job indexed fine but the RAG system couldn't load the result
+        "reload_error": indexing_job.state.get("reload_error")
     }
 
 # ============================================================================
@@ -0,0 +1,176 @@
+"""
+Write-behind logging of chat turns.
+Endpoints hand messages to an in-memory queue and return; a background task
+writes them to the conversations/messages tables in batches through the async
+engine, so persisting a conversation never adds a database round trip to
+chat latency.
+Conversation IDs are issued by the server and signed for the caller's bearer
+token, so only the caller that started a conversation can add to it or read
+it back, without a database lookup per turn.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, Conversation, Message
+
+# Flush every interval, or sooner once a batch has built up
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "2"))
+MESSAGE_FLUSH_BATCH = int(os.getenv("MESSAGE_FLUSH_BATCH", "200"))
+# Messages held in memory before new ones are dropped (database down or slow)
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))
+
+# Key signing conversation IDs; without it IDs only stay valid until a restart
+CONVERSATION_SECRET = os.getenv("CONVERSATION_SECRET", "")
+if not CONVERSATION_SECRET:
+    print("Warning: CONVERSATION_SECRET is not set; conversation IDs won't survive a restart")
+    CONVERSATION_SECRET = secrets.token_hex(32)
+
+
+def conversation_owner(token: Optional[str]) -> str:
+    """Owner key of a caller: a hash of its bearer token ("" when anonymous)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest() if token else ""
+
+
+def _signature(nonce: str, owner: str) -> str:
+    message = f"{nonce}|{owner}".encode('utf-8')
+    return hmac.new(CONVERSATION_SECRET.encode('utf-8'), message, hashlib.sha256).hexdigest()[:32]
+
+
+def new_conversation_id(owner: str) -> str:
+    """Fresh conversation ID bound to owner"""
+    nonce = uuid.uuid4().hex
+    return f"{nonce}.{_signature(nonce, owner)}"
+
+
+def owns_conversation(conversation_id: str, owner: str) -> bool:
+    """True if conversation_id was issued to owner"""
+    nonce, _, signature = conversation_id.partition(".")
+    return bool(nonce and signature) and hmac.compare_digest(signature, _signature(nonce, owner))
+
+
+class MessageLog:
+    """Batched, best-effort writer for chat messages"""
+
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def log_turn(
+        self,
+        conversation_id: str,
+        question: str,
+        answer: str,
+        context: Optional[str] = None,
+        chapter: Optional[str] = None
+    ):
+        """Queue a question and its answer; never blocks or touches the database"""
+        if len(self._pending) + 2 > self.max_pending:
+            if self.dropped == 0:
+                print("Warning: chat message log is full; dropping messages")
+            self.dropped += 2
+            return
+
+        now = datetime.utcnow()
+        for role, content in (("user", question), ("assistant", answer)):
+            self._pending.append({
+                'conversation_id': conversation_id,
+                'role': role,
+                'content': content,
+                'context': context if role == "user" else None,
+                'chapter': chapter,
+                'created_at': now
+            })
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the background flusher (application startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write queued messages in batches (a failed batch is dropped)"""
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                print(f"Warning: chat message log write failed ({len(batch)} messages dropped): {e}")
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        first_seen: Dict[str, datetime] = {}
+        for message in batch:
+            first_seen.setdefault(message['conversation_id'], message['created_at'])
+
+        async with AsyncSessionLocal() as session:
+            await _insert_new_conversations(session, first_seen)
+            await session.execute(insert(Message), batch)
+            await session.commit()
+
+
+async def _insert_new_conversations(session: AsyncSession, first_seen: Dict[str, datetime]):
+    """Insert the conversations that aren't stored yet"""
+    rows = [
+        {'conversation_id': conversation_id, 'created_at': created_at}
+        for conversation_id, created_at in first_seen.items()
+    ]
+    dialect = session.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        await session.execute(
+            upsert(Conversation).values(rows).on_conflict_do_nothing(index_elements=['conversation_id'])
+        )
+        return
+
+    existing = set((await session.execute(
+        select(Conversation.conversation_id).where(Conversation.conversation_id.in_(list(first_seen)))
+    )).scalars())
+    rows = [row for row in rows if row['conversation_id'] not in existing]
+    if rows:
+        await session.execute(insert(Conversation), rows)
+
+
+message_log = MessageLog(MESSAGE_FLUSH_INTERVAL, MESSAGE_FLUSH_BATCH, MESSAGE_QUEUE_SIZE)
@@ -0,0 +1,221 @@
+"""
+Prometheus metrics for the backend, served at /metrics.
+Covers per-route request latency, per-stage RAG latency (embed, cache,
+search, sparse, assemble, generate), LLM token usage and estimated cost per endpoint,
+in-flight, queued, coalesced and rejected LLM calls, and cache hit ratios.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# USD per token (prompt, completion); unknown models are priced as gpt-3.5-turbo
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0000015, 0.000002),
+    "gpt-4o-mini": (0.00000015, 0.0000006),
+    "gpt-4o": (0.0000025, 0.00001),
+    "gpt-4": (0.00003, 0.00006),
+}
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request to the last response byte, per route",
+    ["method", "route", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+RAG_STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each RAG pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "Chat completion tokens, per endpoint",
+    ["endpoint", "kind"]
+)
+
+LLM_COST = Counter(
+    "llm_cost_usd",
+    "Estimated chat completion cost in USD, per endpoint",
+    ["endpoint"]
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "llm_calls_in_flight",
+    "Chat completion calls currently running, per endpoint",
+    ["endpoint"]
+)
+
+LLM_CALLS_COALESCED = Counter(
+    "llm_calls_coalesced",
+    "Requests served by another request's identical in-flight call, per endpoint",
+    ["endpoint"]
+)
+
+LLM_QUEUED = Gauge(
+    "llm_calls_queued",
+    "Requests waiting for an LLM concurrency slot"
+)
+
+LLM_REJECTED = Counter(
+    "llm_requests_rejected",
+    "Requests answered with 429, per route and reason (budget, queue_full, queue_timeout)",
+    ["route", "reason"]
+)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a chat completion from its token usage"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, MODEL_PRICES["gpt-3.5-turbo"])
+    return prompt_tokens * prompt_price + completion_tokens * completion_price
+
+
+def record_llm_usage(endpoint: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Count a completion's tokens and cost; returns the cost"""
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    LLM_TOKENS.labels(endpoint, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(endpoint, "completion").inc(completion_tokens)
+    LLM_COST.labels(endpoint).inc(cost)
+    return cost
+
+
+@contextmanager
+def llm_call(endpoint: str) -> Iterator[None]:
+    """Count a chat completion (including a whole stream) as in flight"""
+    with LLM_IN_FLIGHT.labels(endpoint).track_inprogress():
+        yield
+
+
+def record_coalesced(endpoint: str):
+    """Count a request that shared an in-flight call instead of making its own"""
+    LLM_CALLS_COALESCED.labels(endpoint).inc()
+
+
+def record_rejection(route: str, reason: str):
+    """Count a request turned away by admission control"""
+    LLM_REJECTED.labels(route, reason).inc()
+
+
+def track_queue_depth(depth: Callable[[], int]):
+    """Report depth() as the number of queued LLM calls at scrape time"""
+    LLM_QUEUED.set_function(depth)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record the duration of one RAG pipeline stage"""
+    RAG_STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+# ============================================================================
+# Caches
+# ============================================================================
+
+class CacheCollector:
+    """
+    Exposes hit/miss counters and hit ratios for every cache
+
+    In-process caches keep their own counters and are read at scrape time
+    (register_cache); database-backed caches are tallied here
+    (record_cache_lookup).
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        self._tallies: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, stats: Callable[[], Tuple[int, int]]):
+        self._sources[name] = stats
+
+    def record(self, name: str, hit: bool):
+        with self._lock:
+            tally = self._tallies.setdefault(name, {'hits': 0, 'misses': 0})
+            tally['hits' if hit else 'misses'] += 1
+
+    def _counts(self) -> Dict[str, Tuple[int, int]]:
+        with self._lock:
+            counts = {name: (t['hits'], t['misses']) for name, t in self._tallies.items()}
+        for name, stats in list(self._sources.items()):
+            try:
+                counts[name] = stats()
+            except Exception:
+                continue
+        return counts
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Hits / lookups since start", labels=["cache"])
+        for name, (hit_count, miss_count) in sorted(self._counts().items()):
+            lookups = hit_count + miss_count
+            hits.add_metric([name], hit_count)
+            misses.add_metric([name], miss_count)
+            ratio.add_metric([name], hit_count / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+_caches = CacheCollector()
+REGISTRY.register(_caches)
+
+
+def register_cache(name: str, stats: Callable[[], Tuple[int, int]]):
+    """Expose an in-process cache; stats() returns (hits, misses) so far"""
+    _caches.register(name, stats)
+
+
+def record_cache_lookup(name: str, hit: bool):
+    """Count one lookup of a cache that doesn't keep its own counters"""
+    _caches.record(name, hit)
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template
+
+    Timing stops at the last body chunk, so streamed responses are measured
+    end to end. Requests matching no route share the "unmatched" label to
+    keep cardinality bounded.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_wrapper(message: Dict[str, Any]):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, str(status or 500)).observe(
+                time.perf_counter() - start
+            )
+
+
+def render() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
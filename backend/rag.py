@@ -1,22 +1,88 @@
 """
 RAG (Retrieval-Augmented Generation) Implementation
 Uses OpenAI for embeddings and chat, Qdrant for vector storage
+
+Qdrant modules are imported where they are used, so the local backend never
+loads qdrant_client; indexing lives in index_content.py. Retrieved candidates
+go through the context assembler (threshold, MMR, token budget) before
+reaching the prompt.
 """
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, AsyncIterator, Tuple
 from pydantic import SecretStr
 try:
     from langchain_openai import OpenAIEmbeddings, ChatOpenAI  # type: ignore
-    from langchain_qdrant import QdrantVectorStore  # type: ignore
-    from langchain.text_splitter import RecursiveCharacterTextSplitter  # type: ignore
-    from langchain.chains import ConversationalRetrievalChain  # type: ignore
-    from langchain.memory import ConversationBufferMemory  # type: ignore
-    from qdrant_client import QdrantClient  # type: ignore
-    from qdrant_client.models import Distance, VectorParams  # type: ignore
+    from langchain_core.documents import Document  # type: ignore
+    from embedding_cache import CachedEmbeddings
+    from answer_cache import SemanticAnswerCache, cache_scope
+    from sparse_index import BM25Index, DEFAULT_SPARSE_INDEX_PATH, reciprocal_rank_fusion
+    from vector_config import (  # type: ignore
+        embeddings_kwargs,
+        embedding_signature,
+        vectors_config,
+        quantization_config,
+        search_params,
+        create_payload_indexes,
+        collection_exists,
+        VECTOR_BACKEND,
+        LOCAL_VECTOR_STORE_PATH,
+    )
+    from local_vector_store import LocalVectorStore
+    from context_assembler import ContextAssembler, CONTEXT_CANDIDATES, NO_CONTEXT_ANSWER, RAG_SCORE_THRESHOLD
+    from metrics import observe_stage, record_llm_usage, llm_call, register_cache
+    import llm_clients
+    from admission import llm_slots
 except ImportError as e:
     print(f"Warning: Some dependencies not installed: {e}")
     print("Run: pip install -r requirements.txt")
 import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# Hybrid retrieval: fuse dense results with the local BM25 index
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+
+# Same wording as the chat prompt of LangChain's "stuff" QA chain
+SYSTEM_PROMPT_TEMPLATE = """Use the following pieces of context to answer the user's question. 
+If you don't know the answer, just say that you don't know, don't try to make up an answer.
+----------------
+{context}"""
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Add the wall time of a block to timings[stage] in milliseconds (and to /metrics)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_stage(stage, elapsed)
+        timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 2)
+
+
+def search_scopes(chapter: Optional[str]) -> List[Optional[Dict[str, str]]]:
+    """
+    Metadata filters to try, narrowest first: the chapter, its module, the whole book
+    
+    chapter is the docs path the question was asked from (e.g. module-1/week-1).
+    """
+    scopes: List[Optional[Dict[str, str]]] = []
+    slug = (chapter or "").strip("/")
+    for extension in (".mdx", ".md"):
+        if slug.endswith(extension):
+            slug = slug[:-len(extension)]
+    if slug and slug != "unknown":
+        scopes.append({'chapter': slug})
+        module = slug.split("/")[0]
+        if module.startswith("module-"):
+            scopes.append({'module': module})
+    scopes.append(None)
+    return scopes
 
 
 class RAGSystem:
@@ -24,179 +90,580 @@ class RAGSystem:
     Retrieval-Augmented Generation system for the textbook chatbot
     """
     
-    def __init__(self):
-        """Initialize RAG components"""
+    def __init__(self, http_client: Optional[Any] = None, http_async_client: Optional[Any] = None):
+        """
+        Initialize RAG components
+        
+        Args:
+            http_client: Pooled httpx.Client for OpenAI calls (default: a private one per client)
+            http_async_client: Pooled httpx.AsyncClient for OpenAI calls
+        """
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.qdrant_url = os.getenv("QDRANT_URL")
         self.qdrant_api_key = os.getenv("QDRANT_API_KEY")
         
-        # Initialize OpenAI embeddings
-        self.embeddings = OpenAIEmbeddings(
-            model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
+        # OpenAI clients share the application's connection pool when given one
+        http_clients = {
+            'http_client': http_client,
+            'http_async_client': http_async_client,
+            'request_timeout': llm_clients.timeout()
+        }
+        
+        # Initialize OpenAI embeddings behind the shared embedding cache
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings(
+            **embeddings_kwargs(),
+            **http_clients,
             api_key=SecretStr(self.openai_api_key) if self.openai_api_key else None
-        )
+        ))
         
-        # Initialize Qdrant client
-        self.qdrant_client = QdrantClient(
-            url=self.qdrant_url,
-            api_key=self.qdrant_api_key,
-        )
+        # Vector backend: Qdrant, or the in-process NumPy store (VECTOR_BACKEND=local)
+        self.backend = VECTOR_BACKEND
+        self.local_store: Optional[LocalVectorStore] = None
+        self.qdrant_client = None
+        self.async_qdrant_client = None
+        if self.backend != "local":
+            from qdrant_client import QdrantClient, AsyncQdrantClient  # type: ignore
+            
+            # Initialize Qdrant clients (sync for indexing/stats, async for serving)
+            self.qdrant_client = QdrantClient(
+                url=self.qdrant_url,
+                api_key=self.qdrant_api_key,
+            )
+            self.async_qdrant_client = AsyncQdrantClient(
+                url=self.qdrant_url,
+                api_key=self.qdrant_api_key,
+            )
         
         # Collection name for the book content
         self.collection_name = "physical_ai_robotics_book"
         
+        # Oversample + rescore when vectors are stored quantized
+        self.search_params = search_params()
+        
         # Initialize LLM for chat (using GPT-3.5-turbo for cost efficiency)
         self.llm = ChatOpenAI(
             model=os.getenv("CHAT_MODEL", "gpt-3.5-turbo"),
             temperature=0.7,
-            api_key=SecretStr(self.openai_api_key) if self.openai_api_key else None
+            **http_clients,
+            api_key=SecretStr(self.openai_api_key) if self.openai_api_key else None,
+            stream_usage=True  # Token usage on streamed answers too, for /metrics
         )
         
-        self.vector_store = None
-        self._initialize_collection()
+        # Semantic cache of previous answers, checked before retrieval
+        self.answer_cache = SemanticAnswerCache()
+        register_cache("embedding", self._embedding_cache_counts)
+        register_cache("answer", lambda: (self.answer_cache.hits, self.answer_cache.misses))
+        
+        self.ready = False
+        if self.backend == "local":
+            self._load_local_store()
+        else:
+            self._initialize_collection()
+        
+        # Picks the chunks that reach the prompt from the retrieved candidates
+        self.assembler = ContextAssembler()
+        
+        # Lexical index searched alongside Qdrant (None when hybrid search is off)
+        self.sparse_index = self._load_sparse_index() if HYBRID_SEARCH else None
     
     def _initialize_collection(self):
         """Create Qdrant collection if it doesn't exist"""
         try:
-            # Check if collection exists
-            collections = self.qdrant_client.get_collections().collections
-            collection_names = [col.name for col in collections]
-            
-            if self.collection_name not in collection_names:
+            # Check if collection exists (the name may be an alias after a full re-index)
+            if not collection_exists(self.qdrant_client, self.collection_name):
                 # Create collection with proper vector configuration
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=3072,  # text-embedding-3-large dimension
-                        distance=Distance.COSINE
-                    )
+                    vectors_config=vectors_config(),
+                    quantization_config=quantization_config()
                 )
+                create_payload_indexes(self.qdrant_client, self.collection_name)
                 print(f"Created Qdrant collection: {self.collection_name}")
             
-            # Initialize vector store
-            self.vector_store = QdrantVectorStore(
-                client=self.qdrant_client,
-                collection_name=self.collection_name,
-                embedding=self.embeddings
-            )
+            self.ready = True
             
         except Exception as e:
             print(f"Error initializing Qdrant collection: {e}")
     
-    def index_documents(self, documents: List[Dict[str, str]]) -> int:
+    def _load_local_store(self):
         """
-        Index book chapters into vector database
+        Memory-map the vector matrix written by the indexer
         
-        Args:
-            documents: List of dicts with 'content', 'chapter', 'module' keys
-            
-        Returns:
-            Number of documents indexed
+        A store built with another embedding model or size can't be searched
+        with this server's query vectors, so it leaves the system not ready.
         """
-        if not self.vector_store:
-            raise Exception("Vector store not initialized")
-        
-        # Text splitter for chunking
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        
-        all_chunks = []
-        all_metadata = []
-        
-        for doc in documents:
-            # Split document into chunks
-            chunks = text_splitter.split_text(doc['content'])
+        self.local_store = None
+        self.ready = False
+        try:
+            store = LocalVectorStore.load(LOCAL_VECTOR_STORE_PATH)
+            built_with = store.embedding or {'dimensions': int(store.vectors.shape[1])}
+            expected = embedding_signature()
+            if any(built_with.get(key) != value for key, value in expected.items() if key in built_with):
+                print(
+                    f"Error: local vector store was built with {built_with}, but the server uses "
+                    f"{expected}; re-run the indexer"
+                )
+                return
+            self.local_store = store
+            self.ready = True
+            print(f"Loaded local vector store: {len(self.local_store)} chunks")
+        except Exception as e:
+            print(f"Error loading local vector store: {e}")
+    
+    def _load_sparse_index(self) -> Optional[BM25Index]:
+        """Load the BM25 index written by the indexer, or build it from Qdrant"""
+        path = Path(os.getenv("SPARSE_INDEX_PATH", str(DEFAULT_SPARSE_INDEX_PATH)))
+        try:
+            if path.exists():
+                index = BM25Index.load(path)
+                print(f"Loaded BM25 index: {len(index)} chunks")
+                return index
             
-            # Create metadata for each chunk
-            for chunk in chunks:
-                all_chunks.append(chunk)
-                all_metadata.append({
-                    'chapter': doc.get('chapter', 'Unknown'),
-                    'module': doc.get('module', 'Unknown'),
-                    'title': doc.get('title', '')
-                })
-        
-        # Add to vector store
-        self.vector_store.add_texts(
-            texts=all_chunks,
-            metadatas=all_metadata
-        )
+            if self.local_store is not None:
+                index = BM25Index().build(
+                    (point_id, payload.get('page_content', ''), payload.get('metadata') or {})
+                    for point_id, payload in zip(self.local_store.ids, self.local_store.payloads)
+                )
+                print(f"Built BM25 index from local store: {len(index)} chunks")
+                return index
+            
+            # No local index file (e.g. a fresh deploy): build one from the stored payloads
+            chunks = []
+            offset = None
+            while True:
+                points, offset = self.qdrant_client.scroll(
+                    collection_name=self.collection_name,
+                    limit=256,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                for point in points:
+                    payload = point.payload or {}
+                    chunks.append((str(point.id), payload.get('page_content', ''), payload.get('metadata') or {}))
+                if offset is None:
+                    break
+            
+            index = BM25Index().build(chunks)
+            print(f"Built BM25 index from Qdrant: {len(index)} chunks")
+            return index
         
-        return len(all_chunks)
+        except Exception as e:
+            print(f"Warning: hybrid search disabled, BM25 index unavailable: {e}")
+            return None
     
-    def query(
+    def reload_index(self):
+        """Pick up a finished re-index: reload the local stores and drop cached answers"""
+        if self.backend == "local":
+            self._load_local_store()
+        if HYBRID_SEARCH:
+            self.sparse_index = self._load_sparse_index()
+        self.answer_cache.invalidate()
+    
+    async def aquery(
         self,
         question: str,
         context: Optional[str] = None,
-        k: int = 4
+        k: int = 4,
+        chapter: Optional[str] = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
-        Query the RAG system
+        Query the RAG system without blocking the event loop
+        
+        Runs the prebuilt pipeline: embed query, vector search, assemble
+        prompt, single completion call. Each stage is timed in 'timings'.
         
         Args:
             question: User's question
             context: Optional selected text context
             k: Number of relevant chunks to retrieve
+            chapter: Chapter the question was asked from; retrieval searches it
+                first and widens to its module / the whole book when it has too
+                few relevant chunks (also scopes the answer cache)
+            use_cache: Serve semantically similar earlier answers from the cache
             
         Returns:
-            Dict with answer and sources
+            Dict with answer, sources, whether it came from the cache and
+            per-stage timings in milliseconds
         """
-        if not self.vector_store:
+        if not self.ready:
             raise Exception("Vector store not initialized")
         
-        # If user provided context (selected text), include it in the query
-        enhanced_question = question
-        if context:
-            enhanced_question = f"Based on this context: '{context}'\n\nQuestion: {question}"
+        timings: Dict[str, float] = {}
+        scope = cache_scope(chapter, context)
+        if use_cache:
+            with timed(timings, 'embed'):
+                question_vector = await self.embeddings.aembed_query(question)
+            with timed(timings, 'cache'):
+                cached = self.answer_cache.lookup(question_vector, scope)
+            if cached is not None:
+                return {**cached, 'cached': True, 'timings': timings}
         
-        # Retrieve relevant documents
-        retriever = self.vector_store.as_retriever(
-            search_kwargs={"k": k}
-        )
+        # Cache miss: fail fast if the completion couldn't get an LLM slot anyway
+        llm_slots.check()
+        enhanced_question = self._enhance_question(question, context)
+        docs = await self._aretrieve(enhanced_question, k, timings, chapter)
+        if not docs and not context:
+            return self._no_context_answer(timings)
+        async with llm_slots.slot():
+            with timed(timings, 'generate'), llm_call("chat"):
+                response = await self.llm.ainvoke(self._build_messages(enhanced_question, docs))
+        self._record_usage(response.usage_metadata)
         
-        # Create conversational chain
-        memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer"  # Specify which output to save in memory
-        )
+        return self._finish(question_vector if use_cache else None, scope, response.content, docs, context, timings)
+    
+    async def astream_query(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        k: int = 4,
+        chapter: Optional[str] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a RAG answer as (event, data) pairs
+        
+        Yields ("sources", [...]) as soon as retrieval finishes, then one
+        ("token", str) per generated token, then ("done", {...}).
+        """
+        if not self.ready:
+            raise Exception("Vector store not initialized")
+        
+        timings: Dict[str, float] = {}
+        scope = cache_scope(chapter, context)
+        if use_cache:
+            with timed(timings, 'embed'):
+                question_vector = await self.embeddings.aembed_query(question)
+            with timed(timings, 'cache'):
+                cached = self.answer_cache.lookup(question_vector, scope)
+            if cached is not None:
+                for event in self._replay(cached, timings):
+                    yield event
+                return
+        
+        llm_slots.check()
+        enhanced_question = self._enhance_question(question, context)
+        docs = await self._aretrieve(enhanced_question, k, timings, chapter)
+        if not docs and not context:
+            for event in self._replay(self._no_context_answer(timings), timings):
+                yield event
+            return
+        yield "sources", self._sources(docs)
+        
+        parts = []
+        usage = None
+        async with llm_slots.slot():
+            with timed(timings, 'generate'), llm_call("chat"):
+                async for chunk in self.llm.astream(self._build_messages(enhanced_question, docs)):
+                    usage = chunk.usage_metadata or usage
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield "token", chunk.content
+        self._record_usage(usage)
         
-        qa_chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,  # type: ignore
-            retriever=retriever,  # type: ignore
-            memory=memory,
-            return_source_documents=True
+        answer = self._finish(question_vector if use_cache else None, scope, "".join(parts), docs, context, timings)
+        yield "done", {'cached': False, 'context_used': answer['context_used'], 'timings': timings}
+    
+    async def _aretrieve(
+        self,
+        question: str,
+        k: int,
+        timings: Dict[str, float],
+        chapter: Optional[str] = None
+    ) -> List[Any]:
+        """
+        Dense search, with the BM25 search running in parallel when enabled
+        
+        Over-fetches candidates and returns the up to k the context
+        assembler keeps (none when nothing is relevant enough).
+        """
+        scopes = search_scopes(chapter)
+        fetch_k = max(k * 2, CONTEXT_CANDIDATES)
+        vector: List[float] = []
+        
+        async def dense_search() -> Tuple[List[Tuple[Any, Any]], Optional[Dict[str, str]]]:
+            nonlocal vector
+            with timed(timings, 'embed'):
+                vector = await self.embeddings.aembed_query(question)
+            with timed(timings, 'search'):
+                return await self._ascoped_search(vector, fetch_k, k, scopes)
+        
+        if self.sparse_index is None:
+            dense = (await dense_search())[0]
+            candidates = [doc for doc, _ in dense]
+        else:
+            (dense, filters), sparse = await asyncio.gather(
+                dense_search(),
+                asyncio.to_thread(self._sparse_search, question, fetch_k, timings, scopes[0])
+            )
+            if filters != scopes[0]:
+                # Dense search widened the scope; search the same scope lexically
+                sparse = await asyncio.to_thread(self._sparse_search, question, fetch_k, timings, filters)
+            candidates = self._fuse([doc for doc, _ in dense], sparse, fetch_k)
+        
+        with timed(timings, 'assemble'):
+            vectors = {doc.id: doc_vector for doc, doc_vector in dense}
+            return self.assembler.assemble(vector, await self._awith_vectors(candidates, vectors), k)
+    
+    async def _ascoped_search(
+        self,
+        vector: List[float],
+        k: int,
+        min_hits: int,
+        scopes: List[Optional[Dict[str, str]]]
+    ) -> Tuple[List[Tuple[Any, Any]], Optional[Dict[str, str]]]:
+        """
+        Search the narrowest scope with at least min_hits hits above RAG_SCORE_THRESHOLD
+        
+        Returns:
+            ((document, vector) pairs, filters of the scope that was used)
+        """
+        for filters in scopes:
+            hits = await self._asearch(vector, k, filters)
+            if filters is None or self._relevant_hits(hits) >= min_hits:
+                return [(doc, doc_vector) for doc, _, doc_vector in hits], filters
+        return [], None
+    
+    @staticmethod
+    def _relevant_hits(hits: List[Tuple[Any, float, Any]]) -> int:
+        """Number of hits scoring at or above RAG_SCORE_THRESHOLD"""
+        return sum(1 for _, score, _ in hits if score >= RAG_SCORE_THRESHOLD)
+    
+    def _sparse_search(
+        self,
+        question: str,
+        k: int,
+        timings: Dict[str, float],
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Any]:
+        """BM25 search over the local lexical index"""
+        with timed(timings, 'sparse'):
+            docs = []
+            for doc_id, _ in self.sparse_index.search(question, k, filters):
+                payload = self.sparse_index.payload(doc_id) or {}
+                docs.append(Document(
+                    id=doc_id,
+                    page_content=payload.get('page_content', ''),
+                    metadata=payload.get('metadata') or {}
+                ))
+            return docs
+    
+    async def _awith_vectors(self, docs: List[Any], vectors: Dict[str, Any]) -> List[Tuple[Any, Optional[Any]]]:
+        """
+        Pair candidates with their stored vectors, for scoring and MMR
+        
+        Dense hits already carry theirs; only BM25-only hits are fetched.
+        """
+        missing = [doc.id for doc in docs if doc.id not in vectors]
+        if missing and self.local_store is not None:
+            vectors = {**vectors, **{doc_id: self.local_store.vector(doc_id) for doc_id in missing}}
+        elif missing:
+            points = await self.async_qdrant_client.retrieve(
+                collection_name=self.collection_name,
+                ids=missing,
+                with_payload=False,
+                with_vectors=True
+            )
+            vectors = {**vectors, **{str(point.id): point.vector for point in points}}
+        return [(doc, vectors.get(doc.id)) for doc in docs]
+    
+    @staticmethod
+    def _fuse(dense: List[Any], sparse: List[Any], k: int) -> List[Any]:
+        """Reciprocal-rank fusion of dense and sparse hits"""
+        by_id = {doc.id: doc for doc in sparse}
+        by_id.update({doc.id: doc for doc in dense})
+        ranking = reciprocal_rank_fusion([
+            [doc.id for doc in dense],
+            [doc.id for doc in sparse]
+        ])
+        return [by_id[doc_id] for doc_id in ranking[:k]]
+    
+    async def _asearch(
+        self,
+        vector: List[float],
+        k: int,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Any, float, Any]]:
+        """Vector search in Qdrant or the local store, as (document, score, vector) triples"""
+        if self.local_store is not None:
+            # In-process matrix product; cheaper than handing off to a thread
+            return self._local_search(vector, k, filters)
+        points = await self.async_qdrant_client.search(
+            collection_name=self.collection_name,
+            query_vector=vector,
+            query_filter=self._qdrant_filter(filters),
+            limit=k,
+            search_params=self.search_params,
+            with_payload=True,
+            with_vectors=True
         )
+        return self._documents(points)
+    
+    def _local_search(
+        self,
+        vector: List[float],
+        k: int,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Any, float, Any]]:
+        """Brute-force top-k over the memory-mapped matrix"""
+        return [
+            (
+                Document(
+                    id=point_id,
+                    page_content=payload.get('page_content', ''),
+                    metadata=payload.get('metadata') or {}
+                ),
+                score,
+                self.local_store.vector(point_id)
+            )
+            for point_id, score, payload in self.local_store.search(vector, k, filters)
+        ]
+    
+    @staticmethod
+    def _qdrant_filter(filters: Optional[Dict[str, str]]) -> Optional[Any]:
+        """Metadata equality filters as a Qdrant filter (served by the payload indexes)"""
+        if not filters:
+            return None
+        from qdrant_client import models  # type: ignore
         
-        # Get answer
-        result = qa_chain({"question": enhanced_question})
+        return models.Filter(must=[
+            models.FieldCondition(key=f"metadata.{field}", match=models.MatchValue(value=value))
+            for field, value in filters.items()
+        ])
+    
+    @staticmethod
+    def _documents(points: List[Any]) -> List[Tuple[Any, float, Any]]:
+        """Turn scored Qdrant points (QdrantVectorStore payload layout) into (Document, score, vector) triples"""
+        return [
+            (
+                Document(
+                    id=str(point.id),
+                    page_content=(point.payload or {}).get('page_content', ''),
+                    metadata=(point.payload or {}).get('metadata') or {}
+                ),
+                point.score,
+                point.vector
+            )
+            for point in points
+        ]
+    
+    def _record_usage(self, usage: Optional[Dict[str, Any]]):
+        """Count the tokens and estimated cost of a chat completion"""
+        if usage:
+            record_llm_usage("chat", self.llm.model_name, usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+    
+    def _embedding_cache_counts(self) -> Tuple[int, int]:
+        """(hits, misses) of the embedding cache"""
+        stats = self.embeddings.stats()
+        return stats['memory_hits'] + stats['disk_hits'], stats['misses']
+    
+    def _finish(
+        self,
+        question_vector: Optional[List[float]],
+        scope: Tuple[str, str],
+        answer_text: str,
+        docs: List[Any],
+        context: Optional[str],
+        timings: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """Build the result, remember it in the answer cache and attach timings"""
+        answer = {
+            'answer': answer_text,
+            'sources': self._sources(docs),
+            'context_used': context is not None,
+            'cached': False
+        }
+        if question_vector is not None:
+            self.answer_cache.store(question_vector, scope, answer)
         
-        # Extract source information
-        sources = []
-        for doc in result.get('source_documents', []):
-            sources.append({
+        return {**answer, 'timings': timings}
+    
+    @staticmethod
+    def _no_context_answer(timings: Dict[str, float]) -> Dict[str, Any]:
+        """Canned reply when no chunk is relevant enough; the LLM isn't called"""
+        return {
+            'answer': NO_CONTEXT_ANSWER,
+            'sources': [],
+            'context_used': False,
+            'cached': False,
+            'timings': timings
+        }
+    
+    @staticmethod
+    def _replay(answer: Dict[str, Any], timings: Dict[str, float]) -> Iterator[Tuple[str, Any]]:
+        """Stream events for an answer that is already complete (cached or canned)"""
+        yield "sources", answer['sources']
+        yield "token", answer['answer']
+        yield "done", {'cached': answer['cached'], 'context_used': answer['context_used'], 'timings': timings}
+    
+    @staticmethod
+    def _enhance_question(question: str, context: Optional[str]) -> str:
+        """Fold user-selected text into the question"""
+        if context:
+            return f"Based on this context: '{context}'\n\nQuestion: {question}"
+        return question
+    
+    @staticmethod
+    def _build_messages(question: str, docs: List[Any]) -> List[Tuple[str, str]]:
+        """Chat messages stuffing the retrieved chunks into the system prompt"""
+        context_text = "\n\n".join(doc.page_content for doc in docs)
+        return [
+            ("system", SYSTEM_PROMPT_TEMPLATE.format(context=context_text)),
+            ("human", question)
+        ]
+    
+    @staticmethod
+    def _sources(docs: List[Any]) -> List[Dict[str, str]]:
+        """Source summaries returned alongside answers"""
+        return [
+            {
                 'chapter': doc.metadata.get('chapter', 'Unknown'),
                 'module': doc.metadata.get('module', 'Unknown'),
+                'section': " > ".join(doc.metadata.get('heading_path') or []),
                 'content_preview': doc.page_content[:200] + "..."
-            })
+            }
+            for doc in docs
+        ]
+    
+    async def awarm_up(self) -> Dict[str, float]:
+        """
+        Open the embeddings and vector search connections with a throwaway query
         
-        return {
-            'answer': result['answer'],
-            'sources': sources,
-            'context_used': context is not None
-        }
+        The embedding call bypasses the cache so it really reaches the API.
+        
+        Returns:
+            Milliseconds spent per stage
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        vector = await self.embeddings.embeddings.aembed_query("warm-up")
+        timings['embed'] = round((time.perf_counter() - start) * 1000, 2)
+        
+        start = time.perf_counter()
+        await self._asearch(vector, 1)
+        timings['search'] = round((time.perf_counter() - start) * 1000, 2)
+        return timings
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the indexed content"""
+        if self.backend == "local":
+            return {
+                'total_documents': len(self.local_store) if self.local_store else 0,
+                'collection_name': 'local',
+                'status': 'ready' if self.ready else 'error',
+                'embedding_cache': self.embeddings.stats(),
+                'answer_cache': self.answer_cache.stats()
+            }
+        
         try:
             collection_info = self.qdrant_client.get_collection(self.collection_name)
             return {
                 'total_documents': collection_info.points_count,
                 'collection_name': self.collection_name,
-                'status': 'ready'
+                'status': 'ready',
+                'embedding_cache': self.embeddings.stats(),
+                'answer_cache': self.answer_cache.stats()
             }
         except Exception as e:
             return {
@@ -209,10 +676,22 @@ class RAGSystem:
 
 # Singleton instance
 _rag_instance = None
+_rag_lock = threading.Lock()
 
 def get_rag_system() -> RAGSystem:
     """Get or create RAG system singleton"""
     global _rag_instance
     if _rag_instance is None:
-        _rag_instance = RAGSystem()
+        with _rag_lock:
+            if _rag_instance is None:
+                _rag_instance = RAGSystem(
+                    http_client=llm_clients.http_client(),
+                    http_async_client=llm_clients.async_http_client()
+                )
+    return _rag_instance
+
+async def aget_rag_system() -> RAGSystem:
+    """Get the RAG system singleton, creating it off the event loop"""
+    if _rag_instance is None:
+        return await asyncio.to_thread(get_rag_system)
     return _rag_instance
@@ -0,0 +1,55 @@
+"""
+Single-flight execution for async calls.
+Concurrent callers asking for the same key share one in-flight call
+instead of each starting their own.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def request_key(*parts: Optional[str]) -> str:
+    """Stable hash of request fields, used as a single-flight key"""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """
+    De-duplicate concurrent async calls by key
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task. The task is shielded, so a leader
+    that disconnects doesn't cancel the call for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn() once per key at a time
+
+        Returns:
+            (result, shared) where shared is True if another caller's
+            in-flight call was reused
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]"):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark a failure as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        return len(self._calls)
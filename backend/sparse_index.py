@@ -0,0 +1,175 @@
+"""
+In-process BM25 index over the book chunks.
+Complements dense retrieval on exact tokens (rclpy, URDF, Isaac Sim,
+Jetson Orin) and is fused with Qdrant results via reciprocal-rank fusion.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_SPARSE_INDEX_PATH = Path(__file__).parent / ".sparse_index.json"
+
+# Keeps identifiers like rclpy, ros2_control, nav2, cuda-12, urdf.xacro intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9](?:[a-z0-9_.\-]*[a-z0-9])?")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it
+its of on or so than that the their then there these this to was what when where
+which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms plus adjacent-word bigrams (so "Isaac Sim" matches as a phrase)"""
+    words = [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+    bigrams = [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    return words + bigrams
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked ID lists; each list contributes 1 / (k + rank) per ID"""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts
+
+    Keeps chunk text and metadata alongside the postings so hits found only
+    by the lexical index can be returned without a round trip to Qdrant.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avg_length = 0.0
+        self._positions: Dict[str, int] = {}
+        self._filter_index: Dict[str, Dict[Any, frozenset]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build(self, chunks: Iterable[Tuple[str, str, Dict[str, Any]]]) -> "BM25Index":
+        """Index (id, text, metadata) triples, replacing any previous content"""
+        self.ids, self.payloads, self.lengths, self.postings = [], [], [], {}
+        for doc_id, text, metadata in chunks:
+            self.add(doc_id, text, metadata)
+        return self.finish()
+
+    def add(self, doc_id: str, text: str, metadata: Dict[str, Any]):
+        """Append one chunk while streaming; call finish() before searching"""
+        position = len(self.ids)
+        terms = tokenize(text)
+        for term, count in Counter(terms).items():
+            self.postings.setdefault(term, []).append((position, count))
+        self.ids.append(str(doc_id))
+        self.payloads.append({'page_content': text, 'metadata': metadata})
+        self.lengths.append(len(terms))
+
+    def finish(self) -> "BM25Index":
+        """Make chunks added with add() searchable"""
+        self._finalize()
+        return self
+
+    def _finalize(self):
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self._filter_index = {}
+
+    def _positions_matching(self, field: str, value: Any) -> frozenset:
+        """Positions whose metadata[field] equals value (index built lazily per field)"""
+        index = self._filter_index.get(field)
+        if index is None:
+            groups: Dict[Any, List[int]] = {}
+            for position, payload in enumerate(self.payloads):
+                groups.setdefault((payload.get('metadata') or {}).get(field), []).append(position)
+            index = {key: frozenset(positions) for key, positions in groups.items()}
+            self._filter_index[field] = index
+        return index.get(value, frozenset())
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, score) pairs for a query
+
+        Args:
+            filters: Optional {metadata_field: value}; all fields must match
+        """
+        if not self.ids:
+            return []
+
+        allowed: Optional[frozenset] = None
+        for field, value in (filters or {}).items():
+            matching = self._positions_matching(field, value)
+            allowed = matching if allowed is None else allowed & matching
+        if allowed is not None and not allowed:
+            return []
+
+        total = len(self.ids)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, tf in postings:
+                if allowed is not None and position not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.ids[position], score) for position, score in best]
+
+    def payload(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Stored text and metadata for an ID"""
+        position = self._positions.get(doc_id)
+        return self.payloads[position] if position is not None else None
+
+    def save(self, path: Optional[Path] = None):
+        """Atomically write the index as JSON"""
+        path = Path(path) if path else DEFAULT_SPARSE_INDEX_PATH
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'k1': self.k1,
+                'b': self.b,
+                'ids': self.ids,
+                'payloads': self.payloads,
+                'lengths': self.lengths,
+                'postings': self.postings
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "BM25Index":
+        """Read an index written by save()"""
+        path = Path(path) if path else DEFAULT_SPARSE_INDEX_PATH
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        index = cls(k1=data['k1'], b=data['b'])
+        index.ids = data['ids']
+        index.payloads = data['payloads']
+        index.lengths = data['lengths']
+        index.postings = {term: [tuple(p) for p in plist] for term, plist in data['postings'].items()}
+        index._finalize()
+        return index
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Backend modules are flat scripts imported by name (python main.py, python index_content.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,32 @@
+import pytest
+
+from admission import AdmissionRejected, TokenBucketLimiter, client_key
+
+
+def test_forwarded_for_ignored_without_trusted_proxy():
+    keys = {client_key(None, f"10.0.0.{i}", "203.0.113.7", frozenset()) for i in range(4)}
+
+    assert keys == {"ip:203.0.113.7"}
+
+
+def test_forwarded_for_read_back_to_first_untrusted_hop():
+    proxies = frozenset({"10.0.0.1", "10.0.0.2"})
+
+    key = client_key(None, "198.51.100.9, 192.0.2.4, 10.0.0.2", "10.0.0.1", proxies)
+
+    assert key == "ip:192.0.2.4"
+
+
+def test_bearer_token_wins_over_address():
+    assert client_key("Bearer abc", "192.0.2.4", "10.0.0.1").startswith("token:")
+
+
+def test_budget_rejects_after_burst():
+    budgets = TokenBucketLimiter(rate=0.01, burst=2)
+    key = client_key(None, "spoofed", "203.0.113.7", frozenset())
+    budgets.check(key)
+    budgets.check(key)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        budgets.check(client_key(None, "another-spoof", "203.0.113.7", frozenset()))
+    assert rejected.value.kind == "budget" and rejected.value.retry_after >= 1
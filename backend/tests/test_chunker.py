@@ -0,0 +1,42 @@
+from chunker import HEADING_RE, MarkdownChunker
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def is_heading_only(text: str) -> bool:
+    return all(HEADING_RE.match(line) or not line.strip() for line in text.split("\n"))
+
+
+def test_heading_stays_with_oversized_code_block():
+    code = "```python\n" + "\n".join(f"x_{i} = {i}" for i in range(60)) + "\n```"
+    text = f"## Setup\n\nIntro paragraph.\n\n### Main Robot Controller\n\n{code}\n\nClosing words.\n"
+    chunker = MarkdownChunker(max_tokens=40, overlap_tokens=0, count_tokens=count_words)
+
+    chunks = chunker.chunk(text)
+
+    assert not [c['text'] for c in chunks if is_heading_only(c['text'])]
+    code_chunk = next(c for c in chunks if "```python" in c['text'])
+    assert code_chunk['text'].startswith("### Main Robot Controller")
+    assert code_chunk['heading_path'] == ["Setup", "Main Robot Controller"]
+
+
+def test_code_block_is_not_split_within_limit():
+    code = "```bash\n" + "\n".join(f"echo {i}" for i in range(30)) + "\n```"
+    chunker = MarkdownChunker(max_tokens=40, overlap_tokens=0, count_tokens=count_words)
+
+    chunks = chunker.chunk(f"# Title\n\n{code}\n")
+
+    assert sum(c['text'].count("```") for c in chunks) == 2
+    assert any(code in c['text'] for c in chunks)
+
+
+def test_mdx_noise_is_dropped():
+    text = "import Tabs from '@theme/Tabs';\n\n# Title\n\n<Tabs>\n\nBody text.\n\n</Tabs>\n"
+    chunker = MarkdownChunker(count_tokens=count_words)
+
+    [chunk] = chunker.chunk(text)
+
+    assert "import" not in chunk['text'] and "<Tabs>" not in chunk['text']
+    assert chunk['heading_path'] == ["Title"]
@@ -0,0 +1,17 @@
+from message_log import conversation_owner, new_conversation_id, owns_conversation
+
+
+def test_conversation_belongs_to_the_token_that_started_it():
+    alice, bob = conversation_owner("alice-token"), conversation_owner("bob-token")
+    conversation_id = new_conversation_id(alice)
+
+    assert owns_conversation(conversation_id, alice)
+    assert not owns_conversation(conversation_id, bob)
+    assert not owns_conversation(conversation_id, conversation_owner(None))
+
+
+def test_unsigned_conversation_ids_are_rejected():
+    owner = conversation_owner("alice-token")
+
+    assert not owns_conversation("0123456789abcdef", owner)
+    assert not owns_conversation(new_conversation_id(owner).split(".")[0] + ".forged", owner)
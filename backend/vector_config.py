@@ -0,0 +1,149 @@
+"""
+Embedding and vector storage configuration shared by RAGSystem and ContentIndexer.
+Controls the embedding model/dimensions, which vector backend is used, and
+how Qdrant stores and searches vectors (optional scalar or binary
+quantization with oversampling + rescoring).
+qdrant_client is imported on first use, so the local backend never loads it.
+"""
+
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from qdrant_client import models
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+
+# Output size of each model when no `dimensions` is requested
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+# Requested embedding size (text-embedding-3 models only); unset keeps the native size
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+# Token-split inputs over the model's context length with tiktoken (needs its
+# encoding files, downloaded on first use); chunks are already sized below it
+EMBEDDING_CHECK_CTX_LENGTH = os.getenv("EMBEDDING_CHECK_CTX_LENGTH", "true").lower() in ("1", "true", "yes")
+
+# none | scalar (int8, 4x smaller) | binary (1 bit per dimension, 32x smaller)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+
+# Candidates fetched with quantized vectors, per result, before rescoring in full precision
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
+
+# qdrant | local (in-process NumPy matrix written by the indexer, no external service)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+
+# Directory of the local backend (default: backend/.local_vectors) and its on-disk dtype
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "") or None
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")  # float32 | float16
+
+# Payload fields retrieval filters on; Qdrant keeps a keyword index for each
+PAYLOAD_INDEX_FIELDS = ("metadata.chapter", "metadata.module", "metadata.source", "metadata.title")
+
+
+def vector_size() -> int:
+    """Dimension of stored vectors"""
+    return EMBEDDING_DIMENSIONS or NATIVE_DIMENSIONS.get(EMBEDDING_MODEL, 3072)
+
+
+def embeddings_kwargs() -> Dict[str, Any]:
+    """Model arguments for OpenAIEmbeddings"""
+    kwargs: Dict[str, Any] = {"model": EMBEDDING_MODEL}
+    if not EMBEDDING_CHECK_CTX_LENGTH:
+        kwargs["check_embedding_ctx_length"] = False
+    if EMBEDDING_DIMENSIONS:
+        kwargs["dimensions"] = EMBEDDING_DIMENSIONS
+    return kwargs
+
+
+def embedding_signature() -> Dict[str, Any]:
+    """What stored vectors depend on; a change means everything must be re-embedded"""
+    return {"model": EMBEDDING_MODEL, "dimensions": vector_size()}
+
+
+def vectors_config() -> "models.VectorParams":
+    """Collection vector parameters"""
+    from qdrant_client import models
+
+    return models.VectorParams(
+        size=vector_size(),
+        distance=models.Distance.COSINE,
+        # Quantized vectors live in RAM; originals are only read for rescoring
+        on_disk=VECTOR_QUANTIZATION in ("scalar", "binary")
+    )
+
+
+def quantization_config() -> Optional["models.QuantizationConfig"]:
+    """Collection quantization settings, or None for plain float32"""
+    from qdrant_client import models
+
+    if VECTOR_QUANTIZATION == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    if VECTOR_QUANTIZATION == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
+
+def search_params() -> Optional["models.SearchParams"]:
+    """Search parameters: oversample with quantized vectors, then rescore"""
+    if VECTOR_QUANTIZATION not in ("scalar", "binary"):
+        return None
+    from qdrant_client import models
+
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            ignore=False,
+            rescore=True,
+            oversampling=QUANTIZATION_OVERSAMPLING
+        )
+    )
+
+
+def create_payload_indexes(client: Any, collection_name: str):
+    """Create keyword indexes for filtered search (a no-op for existing indexes)"""
+    from qdrant_client import models
+
+    for field in PAYLOAD_INDEX_FIELDS:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
+
+def alias_target(client: Any, name: str) -> Optional[str]:
+    """Collection an alias points to, or None if name isn't an alias"""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return None
+
+
+def collection_exists(client: Any, name: str) -> bool:
+    """True if name is a collection or an alias of one"""
+    if name in {c.name for c in client.get_collections().collections}:
+        return True
+    return alias_target(client, name) is not None
+
+
+def bytes_per_vector() -> float:
+    """Approximate RAM per stored vector, excluding HNSW links"""
+    size = vector_size()
+    if VECTOR_QUANTIZATION == "scalar":
+        return size
+    if VECTOR_QUANTIZATION == "binary":
+        return size / 8
+    return size * 4
+